@@ -67,4 +67,13 @@ ENABLE_MPC_STYLE_PADS: bool = False
 ENABLE_LONG_PRESS_SUSTAIN_ON_PADS: bool = False
 
 # If True, this will treat the pad LED layout the same as 88-key which is inverted.
-INVERT_LED_LAYOUT: bool = False
\ No newline at end of file
+INVERT_LED_LAYOUT: bool = False
+
+# If True, the knob mapping of each plugin is saved to KNOB_MAPPINGS_FILE in the script folder, so that plugins map
+# their knobs instantly in later sessions. Mappings can be pinned by hand in that file, see arturia/mapping_store.py.
+ENABLE_KNOB_MAPPING_STORE: bool = True
+KNOB_MAPPINGS_FILE: str = 'knob_mappings.jsonl'
+
+# If True, the driver measures how long its MIDI, LED and display callbacks take and counts the events and sysex
+# messages it handles. See arturia/instrument.py to view the results. Leave False for normal use.
+ENABLE_INSTRUMENTATION: bool = False
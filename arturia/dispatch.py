@@ -1,65 +1,213 @@
-from typing import Callable, Any
+from collections.abc import Callable
 import debug
 
+from arturia import instrument
+
 """Import from FL Studio library"""
 import device
 
 class MidiEventDispatcher:
+    __slots__ = ('transform_fn', 'dispatch_map', 'handlers', 'table')
+    
+    # Size of the compiled dispatch table. Covers every status byte and every data byte value.
+    TABLE_SIZE: int = 256
+    
     def __init__(self, transform_fn: Callable) -> None:
         self.transform_fn: Callable                 = transform_fn
-        self.dispatch_map: dict[Callable, Callable] = {}
+        
+        # Map of key -> list of (priority, callback_fn, filter_fn) sorted by descending priority.
+        self.dispatch_map: dict[object, list] = {}
+        
+        # Map of key -> tuple of (callback_fn, filter_fn) in dispatch order, kept in sync with dispatch_map.
+        self.handlers: dict[object, tuple] = {}
+        
+        # Compiled lookup table built by freeze(). None while the dispatcher is not frozen.
+        self.table: list | None = None
         
     def new_handler(
             self, 
             key, 
             callback_fn: Callable, 
-            filter_fn: Callable[[Any], bool] | None = None
+            filter_fn: Callable[[object], bool] | None = None,
+            priority: int = 0
         ) -> "MidiEventDispatcher":
         """ Associate a handler function and optional filter predicate function to a key.
 
         If the transform of the midi event matches the key, then the event is dispatched to the callback function
-        given that the filter predicate function also returns true.
+        given that the filter predicate function also returns true. Several handlers may be registered for the same
+        key with different priorities, in which case the event goes to the highest priority handler whose filter
+        accepts it. Registering a key again at a priority it already has replaces the handler at that priority.
 
         :param key: the result value of transform_fn(event) to match against.
         :param callback_fn: function that is called with the event in the event the transformed event matches.
         :param filter_fn: function that takes an event and returns true if the event should be dispatched. If false
         is returned, then the event is dropped and never passed to callback_fn. Not specifying means that callback_fn
         is always called if transform_fn matches the key.
+        :param priority: handlers with a higher priority are tried first.
         """
-        def default_true_fn(_) -> bool: return True
-        if filter_fn is None: filter_fn = default_true_fn
-        self.dispatch_map[key] = (callback_fn, filter_fn)
+        handlers = [h for h in self.dispatch_map.get(key, ()) if h[0] != priority]
+        handlers.append((priority, callback_fn, filter_fn))
+        handlers.sort(key=lambda h: h[0], reverse=True)
+        self.dispatch_map[key] = handlers
+        self.handlers[key] = tuple((callback_fn, filter_fn) for _, callback_fn, filter_fn in handlers)
+        
+        # Registering after freeze() invalidates the compiled table.
+        self.table = None
         return self
         
-    def new_handler_for_keys(self, keys, callback_fn: Callable, filter_fn: Callable | None = None) -> "MidiEventDispatcher":
+    def new_handler_for_keys(
+            self, 
+            keys, 
+            callback_fn: Callable, 
+            filter_fn: Callable | None = None, 
+            priority: int = 0
+        ) -> "MidiEventDispatcher":
         """ Associate the same handler for a group of keys. See new_handler for more details. """
         for k in keys:
-            self.new_handler(k, callback_fn, filter_fn)
+            self.new_handler(k, callback_fn, filter_fn, priority)
         return self
-        
+    
+    def freeze(self) -> "MidiEventDispatcher":
+        """ Compile the registered handlers into a flat lookup table indexed by key.
+
+        Call once after all handlers are registered. Keys are then resolved with a single list index, and only keys
+        that can't index the table (out of range or not an int) fall back to the handlers map. transform_fn must not
+        return negative ints once frozen, as they would index the table from the end.
+        """
+        table: list = [None] * MidiEventDispatcher.TABLE_SIZE
+        for key, handlers in self.handlers.items():
+            if type(key) is int and 0 <= key < MidiEventDispatcher.TABLE_SIZE:
+                table[key] = handlers
+        self.table = table
+        return self
+    
+    @instrument.timed("dispatch")
     def dispatch(self, event) -> bool:
         """ 
         Dispatches a midi event to the appropriate listener.
         :param event:  the event to dispatch.
         """
         key = self.transform_fn(event)
-        processed: bool = False
-        if key in self.dispatch_map:
-            callback_fn, filter_fn = self.dispatch_map[key]
-            event.handled: bool = True
-            if filter_fn(event):
+        table = self.table
+        if table is None:
+            handlers = self.handlers.get(key)
+        else:
+            try:
+                handlers = table[key]
+            except (IndexError, TypeError):
+                handlers = self.handlers.get(key)
+        if handlers is None:
+            if debug.DEBUG: debug.log("DISPATCHER", "No handler found.", event=event)
+            return False
+        
+        event.handled = True
+        if instrument.ENABLED: instrument.count("events handled")
+        for callback_fn, filter_fn in handlers:
+            if filter_fn is None or filter_fn(event):
                 callback_fn(event)
-                processed = True
-            else:
-                debug.log("DISPATCHER", "Event dropped by filter.", event=event)
-                processed = True
+                return True
+        
+        if debug.DEBUG: debug.log("DISPATCHER", "Event dropped by filter.", event=event)
+        return True
+    
+    
+# Arturia sysex header and footer wrapped around every message sent to the device.
+SYSEX_HEADER: bytes = bytes([0xF0, 0x00, 0x20, 0x6B, 0x7F, 0x42])
+SYSEX_FOOTER: bytes = bytes([0xF7])
+
+# Message priorities for SysexTransport. Lower values are sent first.
+PRIORITY_DISPLAY: int  = 0
+PRIORITY_CONTROL: int  = 1
+PRIORITY_COSMETIC: int = 2
+
+def send_to_device(data, priority: int = PRIORITY_CONTROL) -> None:
+    """ Send a message to the device right away. priority is ignored, see SysexTransport.send. """
+    instrument.count("sysex messages")
+    instrument.count("sysex bytes", len(data) + len(SYSEX_HEADER) + len(SYSEX_FOOTER))
+    device.midiOutSysex(b''.join((SYSEX_HEADER, data, SYSEX_FOOTER)))
+
+
+class SysexTransport:
+    """ Queues messages to the device and sends them by priority, within a bytes per tick budget.
+
+    Display updates go out first, then button and transport LEDs, then cosmetic pad and bank colors. A message queued
+    for a target that already has a pending message replaces it in place, so only the newest value is sent. A pending
+    message for the target in another priority queue is dropped.
+    """
+    __slots__ = ('send_fn', 'budget_bytes_per_tick', 'queues', 'num_queued_bytes', 'num_replaced')
+    
+    # Messages starting with this byte set an LED, 02 00 <command> <LED id>. Their target is the LED id, so that mono
+    # and RGB messages to the same LED replace each other.
+    LED_MESSAGE: int = 0x02
+    LED_ID_INDEX: int = 3
+    
+    # Length of the prefix that identifies the target of other messages, i.e. the display command.
+    TARGET_LENGTH: int = 4
+    
+    # Default number of bytes sent per tick. At the usual 20 ms idle interval this is about 25 KB/s.
+    DEFAULT_BUDGET_BYTES_PER_TICK: int = 512
+    
+    def __init__(self, budget_bytes_per_tick: int = DEFAULT_BUDGET_BYTES_PER_TICK, send_fn=None) -> None:
+        if send_fn is None:
+            send_fn = send_to_device
+        self.send_fn = send_fn
+        self.budget_bytes_per_tick: int = budget_bytes_per_tick
+        
+        # One queue per priority, in send order. Dicts of message target -> newest message for that target.
+        self.queues: list[dict[int | bytes, bytes]] = [{}, {}, {}]
+        self.num_queued_bytes: int = 0
+        
+        # Number of pending messages replaced by a newer message to the same target.
+        self.num_replaced: int = 0
+    
+    def send(self, data, priority: int = PRIORITY_CONTROL) -> None:
+        """ Queue a message for the next flush. Same signature as send_to_device. """
+        queue: dict[int | bytes, bytes] = self.queues[priority]
+        data = bytes(data)
+        if data[0] == SysexTransport.LED_MESSAGE:
+            target: int | bytes = data[SysexTransport.LED_ID_INDEX]
         else:
-            debug.log("DISPATCHER", "No handler found.", event=event)
-            
-        return processed
+            target = data[:SysexTransport.TARGET_LENGTH]
+        
+        pending = queue.get(target)
+        if pending is None:
+            # A target has at most one pending message. It may be queued at another priority, e.g. when a bank LED
+            # switches between mono and RGB.
+            for other_queue in self.queues:
+                pending = other_queue.pop(target, None)
+                if pending is not None: break
+        if pending is not None:
+            self.num_replaced += 1
+            self.num_queued_bytes -= len(pending)
+        
+        # Replacing the value of an existing key keeps its position in the queue
+        queue[target] = data
+        self.num_queued_bytes += len(data)
     
+    def is_empty(self) -> bool:
+        return self.num_queued_bytes == 0
     
-def send_to_device(data) -> None:
-    device.midiOutSysex(bytes([0xF0, 0x00, 0x20, 0x6B, 0x7F, 0x42]) + data + bytes([0xF7]))
+    def flush(self) -> int:
+        """ Send queued messages by priority until the budget of this tick is spent. Called once per tick.
 
+        At least one message is sent per call, even if it exceeds the budget on its own.
 
+        :return: the number of bytes sent, without the sysex header and footer.
+        """
+        if self.num_queued_bytes == 0: return 0
+        
+        budget: int = self.budget_bytes_per_tick
+        num_sent_bytes: int = 0
+        for queue in self.queues:
+            while queue:
+                target = next(iter(queue))
+                data: bytes = queue[target]
+                if num_sent_bytes and num_sent_bytes + len(data) > budget:
+                    self.num_queued_bytes -= num_sent_bytes
+                    return num_sent_bytes
+                del queue[target]
+                self.send_fn(data)
+                num_sent_bytes += len(data)
+        
+        self.num_queued_bytes -= num_sent_bytes
+        return num_sent_bytes
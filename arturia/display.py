@@ -1,10 +1,36 @@
 import time
 
-from arturia.dispatch import send_to_device
+from arturia import instrument
+from arturia.dispatch import send_to_device, PRIORITY_DISPLAY
 
 class DeviceDisplay:
     """Display control"""
-    def __init__(self) -> None:
+    __slots__ = (
+        'send_fn', 'scheduler', 'refresh_timer', 'line1', 'line2', 'ephemeral_line1', 'ephemeral_line2',
+        'expiration_time_ms', 'line1_display_offset', 'line2_display_offset', 'last_update_ms', 'scroll_interval_ms',
+        'line_end_padding', 'line1_encoded', 'line2_encoded', 'version', 'rendered_version', 'deadline_ms', 'payload',
+        'last_display_payload'
+    )
+    
+    # Number of characters visible on each line of the display.
+    LINE_WIDTH: int = 16
+    
+    # Display payload layout: header, line 1 id, 16 chars, terminator, line 2 id, 16 chars, terminator, footer.
+    PAYLOAD_HEADER: bytes       = bytes([0x04, 0x00, 0x60, 0x01])
+    PAYLOAD_LINE2_HEADER: bytes = bytes([0x00, 0x02])
+    PAYLOAD_FOOTER: bytes       = bytes([0x00, 0x7F])
+    LINE1_START: int            = len(PAYLOAD_HEADER)
+    LINE2_START: int            = LINE1_START + LINE_WIDTH + len(PAYLOAD_LINE2_HEADER)
+    
+    def __init__(self, send_fn=None, scheduler=None) -> None:
+        if send_fn is None:
+            send_fn = send_to_device
+        self.send_fn = send_fn
+        
+        # Optional Scheduler used to refresh the display on changes, scroll steps and ephemeral expiration.
+        self.scheduler = scheduler
+        self.refresh_timer: list | None = None
+        
         # line 1 & line 2
         self.line1: str = ' '
         self.line2: str = ' '
@@ -28,32 +54,119 @@ class DeviceDisplay:
         # How many characters to allow last char to scroll before starting over.
         self.line_end_padding: int = 2
         
-        # Track what's currently being displayed
-        self.last_display_payload: bytes = bytes()
-     
+        # Encoded text of the displayed lines, padded with a full line of spaces so that any 16 char window is valid.
+        self.line1_encoded: bytes = DeviceDisplay.encode_line(self.line1)
+        self.line2_encoded: bytes = DeviceDisplay.encode_line(self.line2)
+        
+        # Incremented whenever the line text, offsets or ephemeral state change. Rendering is skipped while the
+        # rendered version matches.
+        self.version: int           = 0
+        self.rendered_version: int  = -1
+        
+        # Timestamp of the next scroll step or ephemeral expiration. 0 when nothing is due.
+        self.deadline_ms: float = 0
+        
+        # Preallocated display payload that is rendered in place and handed to send_fn.
+        self.payload: bytearray = bytearray(
+            DeviceDisplay.PAYLOAD_HEADER + bytes(DeviceDisplay.LINE_WIDTH) + DeviceDisplay.PAYLOAD_LINE2_HEADER
+            + bytes(DeviceDisplay.LINE_WIDTH) + DeviceDisplay.PAYLOAD_FOOTER)
+        
+        # Track what's currently being displayed. Copied into rather than reallocated.
+        self.last_display_payload: bytearray = bytearray(len(self.payload))
+    
+    @staticmethod
+    def abbreviate(text: str, width: int = LINE_WIDTH) -> str:
+        """Shorten text to fit the display width.
+
+        Spaces are dropped first, then vowels that do not start a word, then the text is truncated.
+        """
+        if len(text) <= width: return text
+        
+        words: list[str] = text.split()
+        text = ''.join(word[:1].upper() + word[1:] for word in words)
+        if len(text) <= width: return text
+        
+        text = ''.join(word[:1].upper() + ''.join(c for c in word[1:] if c not in 'aeiouAEIOU') for word in words)
+        return text[:width]
+    
+    @staticmethod
+    def encode_line(line: str) -> bytes:
+        """Encode a line as ascii, padded with a full display width of spaces."""
+        return (line + ' ' * DeviceDisplay.LINE_WIDTH).encode('ascii', 'replace')
+    
+    def is_ephemeral_active(self) -> bool:
+        return self.expiration_time_ms != 0
+    
+    def set_lines(self, line1: str | None = None, line2: str | None = None) -> None:
+        """Set the text of the display lines. Lines that are None are left unchanged."""
+        if line1 is not None and line1 != self.line1:
+            self.line1 = line1
+            self.line1_display_offset = 0
+        if line2 is not None and line2 != self.line2:
+            self.line2 = line2
+            self.line2_display_offset = 0
+        
+        # Start scrolling one interval after the text changed
+        self.last_update_ms = self.get_timestamp_ms()
+        self.on_text_changed()
+    
+    def set_ephemeral_lines(
+            self, 
+            line1: str, 
+            line2: str, 
+            duration_ms: int = 2000, 
+            line1_encoded: bytes | None = None, 
+            line2_encoded: bytes | None = None
+        ) -> None:
+        """Display text temporarily. The regular lines are displayed again after duration_ms.
+
+        line1_encoded and line2_encoded can pass the encode_line result of the lines when it is already known.
+        """
+        self.ephemeral_line1 = line1
+        self.ephemeral_line2 = line2
+        self.expiration_time_ms = self.get_timestamp_ms() + duration_ms
+        self.line1_display_offset = 0
+        self.line2_display_offset = 0
+        self.on_text_changed(line1_encoded, line2_encoded)
+    
+    def on_text_changed(self, line1_encoded: bytes | None = None, line2_encoded: bytes | None = None) -> None:
+        """Re-encode the displayed lines and schedule the next deadline. Call after modifying the line attributes."""
+        line1, line2 = (self.ephemeral_line1, self.ephemeral_line2) if self.is_ephemeral_active() \
+            else (self.line1, self.line2)
+        self.line1_encoded = line1_encoded if line1_encoded is not None else DeviceDisplay.encode_line(line1)
+        self.line2_encoded = line2_encoded if line2_encoded is not None else DeviceDisplay.encode_line(line2)
+        self.version += 1
+        self.update_deadline()
+        self.schedule_refresh(0)
+    
+    def schedule_refresh(self, time_ms: float) -> None:
+        """Schedule a refresh at time_ms, unless one is already scheduled at or before that time."""
+        if self.scheduler is None: return
+        self.refresh_timer = self.scheduler.reschedule(self.refresh_timer, time_ms, self.refresh_display)
+    
+    def update_deadline(self) -> None:
+        """Compute the timestamp of the next scroll step or ephemeral expiration."""
+        deadline: float = 0
+        if self.is_scrolling():
+            deadline = self.last_update_ms + self.scroll_interval_ms
+        if self.expiration_time_ms and (not deadline or self.expiration_time_ms < deadline):
+            deadline = self.expiration_time_ms
+        self.deadline_ms = deadline
+    
+    def is_scrolling(self) -> bool:
+        """Returns True if any of the displayed lines is longer than the display."""
+        width: int = DeviceDisplay.LINE_WIDTH * 2
+        return len(self.line1_encoded) > width or len(self.line2_encoded) > width
+    
     def get_line1_bytes(self) -> bytearray:
         """Max length: 16 bytes"""
         start_pos: int  = self.line1_display_offset
-        end_pos: int    = start_pos + 16
-        line: str       = self.line1
-        
-        # The ephemeral time is not expired
-        if self.expiration_time_ms > self.get_timestamp_ms():
-            line: str = self.ephemeral_line1
-        
-        return bytearray(line[start_pos:end_pos], 'ascii')
-            
+        return bytearray(self.line1_encoded[start_pos:start_pos + DeviceDisplay.LINE_WIDTH])
+    
     def get_line2_bytes(self) -> bytearray:
         """Max length: 16 bytes"""
         start_pos: int  = self.line2_display_offset
-        end_pos: int    = start_pos + 16
-        line: str       = self.line2
-        
-        # The ephemeral time is not expired
-        if self.expiration_time_ms > self.get_timestamp_ms():
-            line: str = self.ephemeral_line2
-        
-        return bytearray(line[start_pos:end_pos], 'ascii')
+        return bytearray(self.line2_encoded[start_pos:start_pos + DeviceDisplay.LINE_WIDTH])
     
     def get_new_offset(self, start_pos: int, line: str) -> int:
         """Get new offset of line to acheive scrolling effect."""
@@ -62,37 +175,76 @@ class DeviceDisplay:
             return 0
         return start_pos + 1
     
-    def update_scroll_pos(self) -> None:
+    def update_scroll_pos(self, current_time_ms: float | None = None) -> None:
         """Update the position while scrolling"""
-        current_time_ms: float = self.get_timestamp_ms()
-
+        if current_time_ms is None: current_time_ms = self.get_timestamp_ms()
+        
         # No need to update yet
         if current_time_ms < self.scroll_interval_ms + self.last_update_ms: return
         
         # update the position
-        self.line1_display_offset = self.get_new_offset(self.line1_display_offset, self.line1)
-        self.line2_display_offset = self.get_new_offset(self.line2_display_offset, self.line2)
+        ephemeral: bool = self.is_ephemeral_active()
+        line1_offset: int = self.get_new_offset(
+            self.line1_display_offset, self.ephemeral_line1 if ephemeral else self.line1)
+        line2_offset: int = self.get_new_offset(
+            self.line2_display_offset, self.ephemeral_line2 if ephemeral else self.line2)
+        if line1_offset != self.line1_display_offset or line2_offset != self.line2_display_offset:
+            self.line1_display_offset = line1_offset
+            self.line2_display_offset = line2_offset
+            self.version += 1
         self.last_update_ms = current_time_ms
     
+    def on_deadline(self, current_time_ms: float) -> None:
+        """Expire ephemeral text and step the scroll position when they are due."""
+        if self.expiration_time_ms and current_time_ms >= self.expiration_time_ms:
+            self.expiration_time_ms = 0
+            self.line1_display_offset = 0
+            self.line2_display_offset = 0
+            
+            # The regular lines start over from their first character, a full scroll interval from now
+            self.last_update_ms = current_time_ms
+            self.on_text_changed()
+        
+        self.update_scroll_pos(current_time_ms)
+        self.update_deadline()
+    
+    def render(self) -> bytearray:
+        """Render the visible part of both lines into the preallocated payload."""
+        payload: bytearray = self.payload
+        width: int = DeviceDisplay.LINE_WIDTH
+        line1_start: int = DeviceDisplay.LINE1_START
+        line2_start: int = DeviceDisplay.LINE2_START
+        line1_offset: int = self.line1_display_offset
+        line2_offset: int = self.line2_display_offset
+        payload[line1_start:line1_start + width] = memoryview(self.line1_encoded)[line1_offset:line1_offset + width]
+        payload[line2_start:line2_start + width] = memoryview(self.line2_encoded)[line2_offset:line2_offset + width]
+        self.rendered_version = self.version
+        return payload
+    
+    @instrument.timed("refresh_display")
     def refresh_display(self) -> None:
         """Refresh the display screen"""
-        data: bytes = bytes([0x04, 0x00, 0x60])
-        data += bytes([0x01]) + self.get_line1_bytes() + bytes([0x00])
-        data += bytes([0x02]) + self.get_line2_bytes() + bytes([0x00])
-        data += bytes([0x7F])
+        if self.deadline_ms:
+            current_time_ms: float = self.get_timestamp_ms()
+            if current_time_ms >= self.deadline_ms: self.on_deadline(current_time_ms)
+        
+        # Wake up again for the next scroll step or ephemeral expiration
+        if self.deadline_ms: self.schedule_refresh(self.deadline_ms)
         
-        self.update_scroll_pos()
+        # Nothing changed since the last render
+        if self.version == self.rendered_version: return
+        
+        payload: bytearray = self.render()
         
         # The last display content not change
-        if self.last_display_payload == data: return
+        if self.last_display_payload == payload: return
         
         # send update msg && update last display payload
-        send_to_device(data)
-        self.last_display_payload = data
-        
+        self.send_fn(payload, PRIORITY_DISPLAY)
+        self.last_display_payload[:] = payload
+    
     @staticmethod
     def get_timestamp_ms() -> float:
         """ Get the current timestamp in milliseconds"""
         return time.monotonic() * 1000
-            
-      
\ No newline at end of file
+
@@ -1,6 +1,11 @@
-from arturia import light, dispatch, config
+import time
+
+from arturia import light, dispatch, config, instrument, surface
+from arturia.names import NameCache, CachedName
+from arturia.pickup import MixerPickup
 from arturia.light import DeviceLights
 from arturia.display import DeviceDisplay
+from arturia.mapping_store import KnobMappingStore
 
 """Import from FL Studio library"""
 import channels
@@ -17,43 +22,153 @@ SCRIPT_VERSION = general.getVersion()
 if SCRIPT_VERSION >= 8:
     import plugins
 
-def get_param_names(plugin_idx):
-    return [plugins.getParamName(i, plugin_idx).lower() for i in range(plugins.getParamCount(plugin_idx))]
+# Keywords used to locate the parameter controlled by each of the 9 knobs.
+KNOB_KEYWORDS: list[tuple[str, ...]] = [
+    ('cutoff', 'filter', '1'),
+    ('resonance', 'filter', '1'),
+    ('lfo', 'delay', '1'),
+    ('lfo', 'rate', '1'),
+    ('macro', '1'),
+    ('macro', '2'),
+    ('macro', '3'),
+    ('macro', '4'),
+    ('chorus',),
+]
 
-def find_parameter_index(parameter_names, *keywords):
-    candidates = set(enumerate(parameter_names))
-    for keyword in keywords:
+# Maximum number of plugins kept in the parameter and knob mapping caches.
+MAX_CACHED_PLUGINS = 64
+
+# Caches keyed by plugin identity: (plugin name, parameter count).
+_param_index_cache: dict[tuple[str, int], "ParameterIndex"] = {}
+_knobs_mapping_cache: dict[tuple[str, int], list[int]] = {}
+
+class ParameterIndex:
+    """ Lower-cased parameter names of a plugin with an inverted keyword index.
+
+    The index maps a keyword to the set of parameter indices whose name contains it. It is filled lazily, so each
+    keyword scans the names once per plugin and every later lookup is a set intersection.
+    """
+    def __init__(self, names: list[str]) -> None:
+        self.names: list[str] = names
+        self.keyword_index: dict[str, frozenset[int]] = {}
+        
+    def matches(self, keyword: str) -> frozenset[int]:
+        """ Get the indices of the parameters whose name contains keyword. """
         keyword = keyword.lower()
-        if len(candidates) <= 1: break
+        indices = self.keyword_index.get(keyword)
+        if indices is None:
+            indices = self.keyword_index[keyword] = frozenset(
+                i for i, name in enumerate(self.names) if keyword in name)
+        return indices
+    
+    def find(self, *keywords) -> int:
+        """ Narrow down the parameters by each keyword in turn, stopping once one candidate or fewer remain.
+
+        :return: the lowest remaining parameter index, or -1 if none matched.
+        """
+        # None stands for all the parameters
+        candidates = None
+        for keyword in keywords:
+            if len(self.names if candidates is None else candidates) <= 1: break
+            matches = self.matches(keyword)
+            candidates = matches if candidates is None else candidates & matches
+        if candidates is None: candidates = range(len(self.names))
+        return min(candidates) if candidates else -1
+
+class ParameterScan:
+    """ Enumerates the parameter names of a plugin a chunk at a time, so that large plugins can be scanned across
+    several idle ticks instead of inside a single FL callback.
+    """
+    # Number of parameter names read between two checks of the time budget.
+    CHUNK_SIZE: int = 32
+    
+    def __init__(self, plugin_idx, key: tuple[str, int]) -> None:
+        self.plugin_idx = plugin_idx
+        self.key: tuple[str, int] = key
+        self.count: int = key[1]
+        self.names: list[str] = []
         
-        next_candidates = []
-        for val in candidates:
-            if keyword in val[1]:
-                next_candidates.append(val)
-        candidates = next_candidates
-    return candidates[0][0] if candidates else -1
+    def is_done(self) -> bool:
+        return len(self.names) >= self.count
+    
+    def get_progress(self) -> int:
+        """ Percentage of the parameters scanned so far. """
+        return 100 * len(self.names) // self.count if self.count else 100
+    
+    def step(self, budget_ms: float) -> bool:
+        """ Read parameter names until all are read or budget_ms has elapsed.
 
-def generate_knobs_mapping(plugin_idx):
-    if SCRIPT_VERSION < 8:
-        return False
+        :return: True once all the parameter names are read.
+        """
+        deadline: float = time.monotonic() + budget_ms / 1000.0
+        names: list[str] = self.names
+        while len(names) < self.count:
+            start: int = len(names)
+            end: int = min(start + ParameterScan.CHUNK_SIZE, self.count)
+            names.extend(plugins.getParamName(i, self.plugin_idx).lower() for i in range(start, end))
+            if time.monotonic() >= deadline: break
+        return self.is_done()
     
-    params = get_param_names(plugin_idx)
-    map_idx = [
-        find_parameter_index(params, 'cutoff', 'filter', '1'),
-        find_parameter_index(params, 'resonance', 'filter', '1'),
-        find_parameter_index(params, 'lfo', 'delay', '1'),
-        find_parameter_index(params, 'lfo', 'rate', '1'),
-        find_parameter_index(params, 'macro', '1'),
-        find_parameter_index(params, 'macro', '2'),
-        find_parameter_index(params, 'macro', '3'),
-        find_parameter_index(params, 'macro', '4'),
-        find_parameter_index(params, 'chorus'),
-    ]
+    def get_index(self) -> ParameterIndex:
+        return ParameterIndex(self.names)
+
+def _cache_put(cache: dict, key, value) -> None:
+    """ Insert into one of the plugin caches, evicting the oldest entry once MAX_CACHED_PLUGINS is reached. """
+    if key not in cache and len(cache) >= MAX_CACHED_PLUGINS: cache.pop(next(iter(cache)))
+    cache[key] = value
+
+def get_plugin_key(plugin_idx) -> tuple[str, int]:
+    """ Identity of the plugin on a channel, used as the cache key for its parameters and knob mapping. """
+    return plugins.getPluginName(plugin_idx), plugins.getParamCount(plugin_idx)
+
+def get_param_names(plugin_idx):
+    return [plugins.getParamName(i, plugin_idx).lower() for i in range(plugins.getParamCount(plugin_idx))]
+
+def get_param_index(plugin_idx) -> ParameterIndex:
+    """ Get the indexed parameter names of a plugin, enumerating the parameters only on the first call. """
+    key = get_plugin_key(plugin_idx)
+    index = _param_index_cache.get(key)
+    if index is None:
+        index = ParameterIndex(get_param_names(plugin_idx))
+        _cache_put(_param_index_cache, key, index)
+    return index
+
+def find_parameter_index(parameter_names, *keywords):
+    return ParameterIndex(parameter_names).find(*keywords)
+
+def compute_knobs_mapping(index: ParameterIndex) -> list[int]:
+    map_idx = [index.find(*keywords) for keywords in KNOB_KEYWORDS]
     for idx in map_idx:
         if idx >= 0:
             return map_idx
     return []
 
+def generate_knobs_mapping(plugin_idx):
+    if SCRIPT_VERSION < 8:
+        return False
+    
+    key = get_plugin_key(plugin_idx)
+    mapping = _knobs_mapping_cache.get(key)
+    if mapping is None:
+        mapping = compute_knobs_mapping(get_param_index(plugin_idx))
+        _cache_put(_knobs_mapping_cache, key, mapping)
+    return mapping
+
+def get_cached_knobs_mapping(key: tuple[str, int]) -> list[int] | None:
+    """ Get the knob mapping of a plugin without querying FL, or None if it has to be computed. """
+    mapping = _knobs_mapping_cache.get(key)
+    if mapping is None and key in _param_index_cache:
+        mapping = compute_knobs_mapping(_param_index_cache[key])
+        _cache_put(_knobs_mapping_cache, key, mapping)
+    return mapping
+
+def store_param_index(key: tuple[str, int], index: ParameterIndex) -> list[int]:
+    """ Cache the parameter names gathered by a ParameterScan and return the knob mapping computed from them. """
+    _cache_put(_param_index_cache, key, index)
+    mapping = compute_knobs_mapping(index)
+    _cache_put(_knobs_mapping_cache, key, mapping)
+    return mapping
+
 class DeviceInputControls:
     """ Manges what the sliders/knobs control on an Arturia Keyboard.
 
@@ -61,6 +176,12 @@ class DeviceInputControls:
     more than 9 encoders/sliders. As such, we will allow mapping the Next/Previous buttons to
     different "pages".
     """
+    __slots__ = (
+        'display', 'lights', 'names', 'pattern_title', 'channel_title', 'mode', 'page', 'pickup', 'surface_cache',
+        'scheduler', 'knobs_mapping', 'scan', 'scan_timer', 'event_ids', 'pending_params', 'params_timer',
+        'last_hint_ms', 'hint_timer', 'mapping_store'
+    )
+    
     INPUT_MODE_CHANNEL_PLUGINS = 0
     INPUT_MODE_MIXER_OVERVIEW = 1
     MODE_NAMES = {
@@ -68,16 +189,282 @@ class DeviceInputControls:
         INPUT_MODE_MIXER_OVERVIEW: 'Mixer Panel',
     }
     MAX_NUM_PAGES = 16   # Bank 0-F for plugins and 0 - 127 for mixer
+    
+    # Maximum time spent scanning plugin parameters in a single idle tick.
+    SCAN_BUDGET_MS = 4
+    
+    # Minimum interval between two hint updates while controls are moving.
+    HINT_INTERVAL_MS = 100
+    
+    # LEDs that belong to the input controls surface and are saved in its snapshots.
+    SURFACE_LED_IDS = [DeviceLights.ID_BANK_NEXT, DeviceLights.ID_BANK_PREVIOUS, DeviceLights.ID_BANK_TOGGLE]
+    
+    DIRTY_MASKS = {
+        INPUT_MODE_CHANNEL_PLUGINS: surface.DIRTY_MASK_CHANNEL_PLUGINS,
+        INPUT_MODE_MIXER_OVERVIEW: surface.DIRTY_MASK_MIXER_OVERVIEW,
+    }
+    
+    def __init__(
+            self, 
+            display: DeviceDisplay | None = None, 
+            scheduler=None, 
+            lights: DeviceLights | None = None,
+            names: NameCache | None = None,
+            mapping_store: KnobMappingStore | None = None
+        ) -> None:
+        self.display: DeviceDisplay | None = display
+        self.lights: DeviceLights | None = lights
+        self.names: NameCache = names if names is not None else NameCache()
+        
+        # Display-ready titles shown above pattern and channel names.
+        self.pattern_title: CachedName = NameCache.prepare('Pattern')
+        self.channel_title: CachedName = NameCache.prepare('Channel')
+        
+        # Current input mode and page.
+        self.mode: int = DeviceInputControls.INPUT_MODE_CHANNEL_PLUGINS if config.SLIDERS_FIRST_CONTROL_PLUGINS \
+            else DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW
+        self.page: int = 0
+        
+        # Pickup state of the sliders in the mixer overview.
+        self.pickup: MixerPickup = MixerPickup()
+        
+        # Snapshots of the surface of previously visited modes and pages.
+        self.surface_cache: surface.SurfaceCache = surface.SurfaceCache()
+        
+        # Optional Scheduler used to spread parameter scans across idle ticks. Without it, scans run to completion.
+        self.scheduler = scheduler
+        
+        # Plugin parameter index controlled by each knob. Provisional while a parameter scan is in progress.
+        self.knobs_mapping: list[int] = []
+        
+        # Parameter scan of the focused plugin, None when no scan is in progress.
+        self.scan: ParameterScan | None = None
+        self.scan_timer: list | None = None
+        
+        # Cache of mixer.getTrackPluginId: (track index, plugin index) -> event id base. The ids only depend on the
+        # indices, so the cache does not need to be cleared when plugins change.
+        self.event_ids: dict[tuple[int, int], int] = {}
+        
+        # Control moves received since the last flush: (track index, plugin index, param id) -> [absolute value or
+        # None, summed increments]. An absolute move replaces everything pending for the control, incremental moves are
+        # added on top of the pending absolute value.
+        self.pending_params: dict[tuple[int, int, int], list] = {}
+        self.params_timer: list | None = None
+        
+        # Hint updates are limited to one per HINT_INTERVAL_MS.
+        self.last_hint_ms: float = 0
+        self.hint_timer: list | None = None
+        
+        # Optional store that keeps knob mappings across sessions and holds the mappings pinned by the user.
+        self.mapping_store: KnobMappingStore | None = mapping_store
 
     @staticmethod
     def to_rec_value(value, limit=midi.FromMIDI_Max):
         return int((value / 127.0) * limit)
     
-    def set_mixer_param(self, param_id, value, incremental=False, track_index=0, plugin_index=0):
-        event_id = mixer.getTrackPluginId(track_index, plugin_index) + param_id
+    def switch_mode(self, mode: int, page: int = 0) -> None:
+        """ Switch the input mode and page, restoring the cached surface snapshot when there is one. """
+        page = max(0, min(page, DeviceInputControls.MAX_NUM_PAGES - 1))
+        if mode == self.mode and page == self.page: return
+        
+        # Keep a snapshot of the surface being left, unless its knob mapping is still provisional.
+        if self.lights is not None and self.display is not None and self.scan is None:
+            dirty_mask: int = DeviceInputControls.DIRTY_MASKS[self.mode]
+            self.surface_cache.put(self.mode, self.page, self.capture_surface(), dirty_mask)
+        
+        self.mode = mode
+        self.page = page
+        state = self.surface_cache.get(mode, page)
+        if state is None:
+            self.refresh_surface()
+            return
+        
+        surface.restore(state, self.lights, self.display)
+        self.knobs_mapping = list(state.knobs_mapping)
+        self.refresh_mixer_values()
+    
+    def capture_surface(self) -> surface.SurfaceState:
+        return surface.capture(DeviceInputControls.SURFACE_LED_IDS, self.lights, self.display, self.knobs_mapping)
+    
+    def refresh_surface(self) -> None:
+        """ Recompute the surface of the current mode and page from FL. """
+        self.refresh_mixer_values()
+        if self.mode == DeviceInputControls.INPUT_MODE_CHANNEL_PLUGINS:
+            self.focus_plugin(channels.selectedChannel())
+        
+        if self.display is not None:
+            self.display.set_lines(DeviceInputControls.MODE_NAMES[self.mode], 'Page %d' % (self.page + 1))
+        
+        if self.lights is not None:
+            self.lights.set_lights({
+                DeviceLights.ID_BANK_PREVIOUS: DeviceLights.AsOnOffByte(self.page > 0),
+                DeviceLights.ID_BANK_NEXT: DeviceLights.AsOnOffByte(self.page < DeviceInputControls.MAX_NUM_PAGES - 1),
+                DeviceLights.ID_BANK_TOGGLE: DeviceLights.AsOnOffByte(
+                    self.mode == DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW),
+            })
+    
+    def on_refresh(self, flags: int) -> None:
+        """ Drop the surface snapshots that depend on the OnRefresh flags. """
+        self.surface_cache.invalidate(flags)
+    
+    def get_slider_track(self, slider: int) -> int:
+        """ Mixer track controlled by a slider in the mixer overview. The last slider controls the master track.
+
+        Returns -1 for sliders past the last track on the last page.
+        """
+        if slider == MixerPickup.NUM_SLIDERS - 1: return 0
+        track: int = self.page * (MixerPickup.NUM_SLIDERS - 1) + slider + 1
+        return track if track < MixerPickup.NUM_TRACKS else -1
+    
+    def refresh_mixer_values(self) -> None:
+        """ Read the volume of the tracks on the current page into the pickup state. Call on mixer dirty flags. """
+        if self.mode != DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW: return
+        for slider in range(MixerPickup.NUM_SLIDERS):
+            track: int = self.get_slider_track(slider)
+            if track < 0: continue
+            self.pickup.on_fl_value(track, slider, MixerPickup.volume_to_slider(mixer.getTrackVolume(track)))
+    
+    def set_mixer_slider(self, slider: int, value: int) -> None:
+        """ Set the volume of the track under a slider in the mixer overview, honoring pickup mode. """
+        track: int = self.get_slider_track(slider)
+        if track < 0: return
+        if config.ENABLE_MIXER_SLIDERS_PICKUP_MODE and not self.pickup.on_hardware_value(track, slider, value): return
+        self.queue_mixer_param(midi.REC_Mixer_Vol, value, track_index=track)
+    
+    def focus_plugin(self, plugin_idx) -> None:
+        """ Map the knobs to the plugin on the given channel.
+
+        Pinned, persisted and cached mappings are applied right away. Otherwise the knobs control the first parameters
+        of the plugin until the parameter scan started here completes. A scan already running for the same plugin is
+        kept, so that repeated focus refreshes do not restart it.
+        """
+        valid: bool = SCRIPT_VERSION >= 8 and plugins.isValid(plugin_idx)
+        key = get_plugin_key(plugin_idx) if valid else None
+        if self.scan is not None and self.scan.plugin_idx == plugin_idx and self.scan.key == key: return
+        
+        self.scan = None
+        if self.scan_timer is not None:
+            self.scheduler.cancel(self.scan_timer)
+            self.scan_timer = None
+        if not valid:
+            self.knobs_mapping = []
+            return
+        
+        mapping = self.mapping_store.get(key) if self.mapping_store is not None else None
+        if mapping is None: mapping = get_cached_knobs_mapping(key)
+        if mapping is not None:
+            self.knobs_mapping = mapping
+            return
+        
+        self.knobs_mapping = list(range(min(key[1], 9)))
+        self.scan = ParameterScan(plugin_idx, key)
+        if self.scheduler is None:
+            self.scan.step(float('inf'))
+            self.on_scan_done()
+        else:
+            self.scan_timer = self.scheduler.call_at(0, self.step_scan)
+    
+    @instrument.timed("step_scan")
+    def step_scan(self) -> None:
+        """ Continue the parameter scan for one idle tick. """
+        self.scan_timer = None
+        scan = self.scan
+        if scan is None: return
+        
+        # The last chunk may use the whole budget, so the knob mapping is computed on the next tick
+        if scan.step(DeviceInputControls.SCAN_BUDGET_MS):
+            self.scan_timer = self.scheduler.call_at(0, self.on_scan_done)
+            return
+        
+        if self.display is not None:
+            self.display.set_ephemeral_lines('Scanning params', '%d%%' % scan.get_progress(), 1000)
+        self.scan_timer = self.scheduler.call_at(0, self.step_scan)
+    
+    @instrument.timed("on_scan_done")
+    def on_scan_done(self) -> None:
+        """ Compute the knob mapping from the scanned parameters. The mapping store is written on the next tick. """
+        self.scan_timer = None
+        scan = self.scan
+        if scan is None: return
+        
+        self.scan = None
+        self.knobs_mapping = store_param_index(scan.key, scan.get_index())
+        if self.mapping_store is None: return
+        if self.scheduler is None:
+            self.mapping_store.record(scan.key, self.knobs_mapping)
+        else:
+            mapping_store, key, mapping = self.mapping_store, scan.key, self.knobs_mapping
+            self.scheduler.call_at(0, lambda: mapping_store.record(key, mapping))
+    
+    def get_event_id(self, track_index, plugin_index) -> int:
+        key = (track_index, plugin_index)
+        event_id = self.event_ids.get(key)
+        if event_id is None:
+            event_id = self.event_ids[key] = mixer.getTrackPluginId(track_index, plugin_index)
+        return event_id
+    
+    @instrument.timed("queue_mixer_param")
+    def queue_mixer_param(self, param_id, value, incremental=False, track_index=0, plugin_index=0):
+        """ Queue a control move to be applied on the next tick. See set_mixer_param for the arguments.
+
+        Consecutive moves of the same control are merged, so that a fast slider sweep or knob turn costs one FL update
+        per tick.
+        """
+        if self.scheduler is None:
+            self.set_mixer_param(param_id, value, incremental, track_index, plugin_index)
+            return
+        
+        key = (track_index, plugin_index, param_id)
+        if not incremental:
+            self.pending_params[key] = [value, 0]
+        else:
+            pending = self.pending_params.get(key)
+            if pending is None: self.pending_params[key] = [None, value]
+            else: pending[1] += value
+            
+        if self.params_timer is None:
+            self.params_timer = self.scheduler.call_at(0, self.flush_mixer_params)
+    
+    @instrument.timed("flush_mixer_params")
+    def flush_mixer_params(self) -> None:
+        """ Apply the queued control moves. """
+        self.params_timer = None
+        pending_params = self.pending_params
+        self.pending_params = {}
+        
+        show_hint: bool = False
+        for (track_index, plugin_index, param_id), (value, increment) in pending_params.items():
+            if value is not None:
+                self.set_mixer_param(param_id, value, False, track_index, plugin_index, show_hint=False)
+            if value is None or increment:
+                self.set_mixer_param(param_id, increment, True, track_index, plugin_index, show_hint=False)
+                show_hint = True
+        
+        if show_hint: self.request_hint()
+    
+    def request_hint(self) -> None:
+        """ Show the FL hint on the display, at most once per HINT_INTERVAL_MS. """
+        if self.hint_timer is not None: return
+        
+        current_time_ms: float = time.monotonic() * 1000
+        next_hint_ms: float = self.last_hint_ms + DeviceInputControls.HINT_INTERVAL_MS
+        if current_time_ms >= next_hint_ms:
+            self.on_hint_timer(current_time_ms)
+        else:
+            self.hint_timer = self.scheduler.call_at(next_hint_ms, self.on_hint_timer)
+    
+    def on_hint_timer(self, current_time_ms: float | None = None) -> None:
+        self.hint_timer = None
+        self.last_hint_ms = time.monotonic() * 1000 if current_time_ms is None else current_time_ms
+        self.check_and_show_hint()
+    
+    @instrument.timed("set_mixer_param")
+    def set_mixer_param(self, param_id, value, incremental=False, track_index=0, plugin_index=0, show_hint=True):
+        event_id = self.get_event_id(track_index, plugin_index) + param_id
         if incremental:
             value = channels.incEventValue(event_id, value, 0.01)
         else:
+            if param_id == midi.REC_Mixer_Vol and plugin_index == 0: self.pickup.on_sent_value(track_index, value)
             max_val = int(12800 * config.MAX_MIXER_VOLUME / 100.0)
             value = DeviceInputControls.to_rec_value(value, limit=max_val)
             
@@ -86,15 +473,31 @@ class DeviceInputControls:
             | midi.REC_UpdateControl | midi.REC_SetChanged
         ) 
         
-        if incremental:
+        if incremental and show_hint:
             self.check_and_show_hint()
     
     def display_hint(self, hint_title: str, hint_value: str, fl_hint=False):
+        hint_title = DeviceDisplay.abbreviate(hint_title)
         if config.HINT_DISPLAY_ALL_CAPS:
             hint_title = hint_title.upper()
             hint_value = hint_value.upper()
             
-        hint_title = DeviceDisplay.abbreviate(hint_title)
+        if self.display is not None:
+            self.display.set_ephemeral_lines(hint_title, hint_value)
+        
+        if fl_hint and config.ENABLE_CONTROLS_FL_HINTS:
+            ui.setHintMsg('%s: %s' % (hint_title, hint_value))
+    
+    def display_name(self, title: CachedName, name: CachedName) -> None:
+        """ Show a cached name on the display, i.e. while scrolling patterns or channels with the nav wheel. """
+        if self.display is None: return
+        self.display.set_ephemeral_lines(title.text, name.text, line1_encoded=title.encoded, line2_encoded=name.encoded)
+    
+    def display_pattern(self, index: int) -> None:
+        self.display_name(self.pattern_title, self.names.get_pattern(index))
+    
+    def display_channel(self, index: int) -> None:
+        self.display_name(self.channel_title, self.names.get_channel(index))
     
     def check_and_show_hint(self):
         hint = ui.getHintMsg()
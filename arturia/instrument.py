@@ -0,0 +1,119 @@
+import time
+from collections.abc import Callable
+
+from arturia import config
+
+# Instrumentation is skipped entirely unless enabled. Timed callbacks are only wrapped if instrumentation is enabled
+# when the script loads, after which it can be toggled at runtime from the script console.
+ENABLED: bool = config.ENABLE_INSTRUMENTATION
+
+class Histogram:
+    """ Fixed memory histogram of durations in microseconds.
+
+    Bucket i counts durations in [2^(i-1), 2^i) us, so percentiles are reported as the upper bound of their bucket.
+    """
+    NUM_BUCKETS: int = 24
+    
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.buckets: list[int] = [0] * Histogram.NUM_BUCKETS
+        self.count: int = 0
+        self.max_us: float = 0
+    
+    def add(self, duration_us: float) -> None:
+        self.buckets[min(int(duration_us).bit_length(), Histogram.NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        if duration_us > self.max_us: self.max_us = duration_us
+    
+    def percentile(self, fraction: float) -> float:
+        """ Upper bound in microseconds of the bucket holding the given fraction of the durations, capped to the
+        maximum duration recorded.
+        """
+        rank: float = fraction * self.count
+        total: int = 0
+        for i, bucket in enumerate(self.buckets):
+            total += bucket
+            if total >= rank and total: return min(1 << i, self.max_us)
+        return 0
+    
+    def reset(self) -> None:
+        self.buckets = [0] * Histogram.NUM_BUCKETS
+        self.count = 0
+        self.max_us = 0
+
+# Histograms of the timed callbacks, by name.
+histograms: dict[str, Histogram] = {}
+
+# Event counters, by name.
+counters: dict[str, int] = {}
+
+# Duration of each script startup phase in milliseconds. Recorded even when instrumentation is disabled, as it only
+# costs one clock read per phase.
+startup_ms: dict[str, float] = {}
+
+def timed(name: str) -> Callable:
+    """ Decorator recording the duration of every call in the histogram with the given name. """
+    histogram = histograms.setdefault(name, Histogram(name))
+    perf_counter = time.perf_counter
+    
+    def decorator(fn: Callable) -> Callable:
+        # Leave the function untouched, so that disabled instrumentation costs nothing per call.
+        if not ENABLED: return fn
+        
+        from functools import wraps
+        
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED: return fn(*args, **kwargs)
+            start_s: float = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.add((perf_counter() - start_s) * 1e6)
+        return wrapper
+    return decorator
+
+def count(name: str, amount: int = 1) -> None:
+    """ Add to the counter with the given name. """
+    if ENABLED: counters[name] = counters.get(name, 0) + amount
+
+def record_startup(phase: str, start_s: float) -> float:
+    """ Record the time elapsed since start_s, a time.perf_counter timestamp, as the duration of a startup phase.
+
+    :return: the current timestamp, to be passed as start_s of the next phase.
+    """
+    now_s: float = time.perf_counter()
+    startup_ms[phase] = (now_s - start_s) * 1000
+    return now_s
+
+def get_startup_ms() -> float:
+    """ Total duration of the recorded startup phases in milliseconds. """
+    return sum(startup_ms.values())
+
+def reset() -> None:
+    for histogram in histograms.values():
+        histogram.reset()
+    counters.clear()
+
+def snapshot() -> list[str]:
+    """ Format the current histograms and counters, one per line. """
+    lines: list[str] = ['%-24s p50 %8.1f us | p99 %8.1f us | max %8.1f us | n %d' % (
+        histogram.name, histogram.percentile(0.5), histogram.percentile(0.99), histogram.max_us, histogram.count)
+        for histogram in histograms.values() if histogram.count]
+    lines.extend('%-24s %d' % (name, value) for name, value in counters.items())
+    lines.extend('startup %-16s %.2f ms' % (phase, duration_ms) for phase, duration_ms in startup_ms.items())
+    return lines
+
+def print_snapshot() -> None:
+    """ Print the snapshot to the script console. """
+    for line in snapshot():
+        print(line)
+
+def show_on_display(display, duration_ms: int = 5000) -> None:
+    """ Show the callback with the worst p99 on the keyboard display. """
+    worst = max((h for h in histograms.values() if h.count), key=lambda h: h.percentile(0.99), default=None)
+    if worst is None:
+        display.set_ephemeral_lines('Instrumentation', 'No data', duration_ms)
+        return
+    display.set_ephemeral_lines(worst.name[:16], 'p99 %dus max %dus' % (worst.percentile(0.99), worst.max_us),
+                                duration_ms)
@@ -0,0 +1,83 @@
+"""Pad geometry of the supported keyboard models, resolved into flat lookup tables once."""
+from arturia import config
+
+"""Import from FL Studio library"""
+import device
+
+# Keyboard model, resolved once from the device name.
+DEVICE_NAME: str = device.getName()
+ESSENTIAL_KEYBOARD: bool = 'mkII' not in DEVICE_NAME
+MKII_88_KEYBOARD: bool = 'mkII 88' in DEVICE_NAME
+MKII_49_KEYBOARD: bool = 'mkII 49' in DEVICE_NAME
+
+# Midi note of the bottom left pad. Notes increase left to right, then bottom to top.
+MIDI_DRUM_PAD_DATA1_MIN: int = 36
+NUM_PAD_ROWS: int = 4
+NUM_PAD_COLS: int = 4
+NUM_PADS: int = NUM_PAD_ROWS * NUM_PAD_COLS
+
+# 4x4 lookup for the pad ids.
+MATRIX_IDS_PAD: list[list[int]] = [
+    [112, 113, 114, 115],
+    [116, 117, 118, 119],
+    [120, 121, 122, 123],
+    [124, 125, 126, 127],
+]
+
+# Returned for notes that are not pads.
+MISSING: int = 0
+
+class PadLayout:
+    """ Flat lookup tables between pad notes, pad LED ids and channel rack indices for one keyboard variant.
+
+    :param inverted: True if the pad LED ids are flipped vertically (49/88 keys or INVERT_LED_LAYOUT).
+    :param mpc_style: True if the top left pad is the first channel (ENABLE_MPC_STYLE_PADS).
+    """
+    def __init__(self, inverted: bool, mpc_style: bool) -> None:
+        self.inverted: bool = inverted
+        self.mpc_style: bool = mpc_style
+        
+        # Midi note -> LED id, MISSING for notes that are not pads.
+        self.note_to_led: list[int] = [MISSING] * 128
+        
+        # Midi note -> channel rack index, -1 for notes that are not pads.
+        self.note_to_channel: list[int] = [-1] * 128
+        
+        # Row major matrix position (row * 4 + col, as in MATRIX_IDS_PAD) -> LED id.
+        self.matrix_led_ids: list[int] = [led_id for row in MATRIX_IDS_PAD for led_id in row]
+        
+        for idx in range(NUM_PADS):
+            note: int = MIDI_DRUM_PAD_DATA1_MIN + idx
+            col: int = idx % NUM_PAD_COLS
+            row_from_bottom: int = idx // NUM_PAD_COLS
+            
+            if inverted:
+                # On 49/88 keyboard, the button IDs are flipped:
+                # 0x30, 0x31, 0x32, 0x33
+                # 0x2C, 0x2D, 0x2E, 0x2F
+                # 0x28, 0x29, 0x30, 0x31
+                # 0x24, 0x25, 0x26, 0x27
+                self.note_to_led[note] = MATRIX_IDS_PAD[NUM_PAD_ROWS - 1 - row_from_bottom][col]
+            else:
+                self.note_to_led[note] = MATRIX_IDS_PAD[0][0] + idx
+            
+            if mpc_style:
+                self.note_to_channel[note] = (NUM_PAD_ROWS - 1 - row_from_bottom) * NUM_PAD_COLS + col
+            else:
+                self.note_to_channel[note] = idx
+
+# Layouts built so far, by (inverted, mpc_style).
+_layouts: dict[tuple[bool, bool], PadLayout] = {}
+
+def get_pad_layout(inverted: bool | None = None, mpc_style: bool | None = None) -> PadLayout:
+    """ Get the pad layout of a keyboard variant, building its tables on first use.
+
+    Defaults to the connected keyboard and the current config. Essential keyboards use the 61 key layout.
+    """
+    if inverted is None: inverted = MKII_88_KEYBOARD or MKII_49_KEYBOARD or config.INVERT_LED_LAYOUT
+    if mpc_style is None: mpc_style = config.ENABLE_MPC_STYLE_PADS
+    key = (inverted, mpc_style)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = _layouts[key] = PadLayout(inverted, mpc_style)
+    return layout
@@ -1,20 +1,22 @@
-from typing import Literal
+from collections import OrderedDict
+from itertools import chain
 import time
 
-from arturia.dispatch import send_to_device
-import arturia.config
+from arturia import instrument, layout
+from arturia.dispatch import send_to_device, PRIORITY_CONTROL, PRIORITY_COSMETIC
+from arturia.layout import ESSENTIAL_KEYBOARD, MKII_88_KEYBOARD, MKII_49_KEYBOARD
 
 
 """Import from FL Studio library"""
-import device
 import utils
 
-ESSENTIAL_KEYBOARD = 'mkII' not in device.getName()
-MKII_88_KEYBOARD = 'mkII 88' in device.getName()
-MKII_49_KEYBOARD = 'mkII 49' in device.getName()
-
 class DeviceLights:
     """Maintains setting all the button lights on the Arturia device."""
+    __slots__ = (
+        'send_fn', 'scheduler', 'flush_timer', 'desired', 'sent', 'dirty', 'last_send_ms', 'num_dropped',
+        'num_coalesced', 'num_sent', 'rgb_states', 'mono_message', 'rgb_message'
+    )
+    
     # Value for turning on/off an LED.
     LED_ON: int = 127
     LED_OFF: int = 0
@@ -67,12 +69,10 @@ class DeviceLights:
     ID_TRANSPORTS_LOOP      = 111
     
     # 4x4 lookup for the pad ids.
-    MATRIX_IDS_PAD: list[list[int]] = [
-        [112, 113, 114, 115],
-        [116, 117, 118, 119],
-        [120, 121, 122, 123],
-        [124, 125, 126, 127],
-    ]
+    MATRIX_IDS_PAD: list[list[int]] = layout.MATRIX_IDS_PAD
+    
+    # All the pad ids, whose updates are cosmetic and sent after the other LEDs.
+    PAD_IDS: frozenset[int] = frozenset(led_id for row in MATRIX_IDS_PAD for led_id in row)
     
     # Command bytes for setting monochrome light (followed by id, 7-bit LED value)
     SET_MONOCHROME_LIGHT_COMMAND: bytes = bytes([0x02, 0x00, 0x10])
@@ -80,13 +80,65 @@ class DeviceLights:
     # Command bytes for setting RGB light (followed by id, 7-bit R, 7-bit G, 7-bit B)
     SET_RGB_LIGHT_COMMAND: bytes = bytes([0x02, 0x00, 0x16])
     
-    def __init__(self, send_fn=None):
+    # Color conversion variants accepted by to_device_color(s).
+    COLOR_7BIT: int  = 0
+    COLOR_FADED: int = 1
+    COLOR_FULL: int  = 2
+    
+    # Maximum number of converted colors kept in the color cache.
+    COLOR_CACHE_SIZE: int = 256
+    
+    # LRU cache of converted colors: (source rgb, variant) -> packed 7-bit color ready for set_lights(..., rgb=True).
+    _color_cache: OrderedDict = OrderedDict()
+    
+    # Maximum number of LED commands flushed to the device in a single tick. Remaining dirty LEDs are carried over to
+    # the next tick so a full repaint is paced across a few ticks instead of flooding the keyboard.
+    MAX_LEDS_PER_FLUSH: int = 24
+    
+    # Minimum interval between two commands to the same LED. Newer values arriving within the window are held back and
+    # sent once the window expires.
+    MIN_LED_INTERVAL_MS: int = 33
+    
+    # Interned (value, rgb) states of the monochrome LED values, so that setting an LED does not allocate a new tuple.
+    MONO_STATES: list[tuple[int, bool]] = [(value, False) for value in range(128)]
+    
+    # Upper bound of interned RGB states before the table is reset.
+    MAX_RGB_STATES: int = 1024
+    
+    def __init__(self, send_fn=None, scheduler=None):
         if send_fn is None:
             send_fn = send_to_device
         self.send_fn = send_fn
+        
+        # Optional Scheduler used to flush the dirty LEDs when they are due.
+        self.scheduler = scheduler
+        self.flush_timer: list | None = None
 
+        # Desired state of every LED: led id -> (value, rgb). Value is a 7-bit brightness for monochrome LEDs or a
+        # packed 7-bit color for RGB LEDs.
+        self.desired: dict[int, tuple[int, bool]] = {}
+        
+        # State last sent to the device for every LED.
+        self.sent: dict[int, tuple[int, bool]] = {}
+        
+        # LEDs whose desired state differs from the sent state (dict used as an insertion ordered set).
+        self.dirty: dict[int, None] = {}
+        
         # Map of last send times
-        self.last_send_ms = {}
+        self.last_send_ms: dict[int, float] = {}
+        
+        # Update counters. Dropped updates matched what the device already shows, coalesced updates replaced a value
+        # that was still pending and sent counts the LED commands actually sent.
+        self.num_dropped: int = 0
+        self.num_coalesced: int = 0
+        self.num_sent: int = 0
+        
+        # Interned (value, True) states of RGB LED values.
+        self.rgb_states: dict[int, tuple[int, bool]] = {}
+        
+        # Reused command buffers, filled in with the LED id and value before being sent.
+        self.mono_message: bytearray = bytearray(DeviceLights.SET_MONOCHROME_LIGHT_COMMAND + bytes(2))
+        self.rgb_message: bytearray = bytearray(DeviceLights.SET_RGB_LIGHT_COMMAND + bytes(4))
         
     @staticmethod
     def AsOnOffByte(is_on: bool):
@@ -94,7 +146,7 @@ class DeviceLights:
         return DeviceLights.LED_ON if is_on else DeviceLights.LED_OFF
     
     @staticmethod
-    def get_zero_matrix(zero: Literal[0] = 0) -> list[list[int]]:
+    def get_zero_matrix(zero: int = 0) -> list[list[int]]:
         num_rows: int = len(DeviceLights.MATRIX_IDS_PAD)
         num_cols: int = len(DeviceLights.MATRIX_IDS_PAD[0])
         return [[zero]*num_cols for _ in range(num_rows)]
@@ -120,7 +172,7 @@ class DeviceLights:
         return int(float(value) * (127.0 / 255.0))
     
     @staticmethod
-    def to7bitColor(color) -> bytes:
+    def _to7bitColor(color) -> int:
         r, g, b = DeviceLights.int2rgb(color)
         r = DeviceLights.to7bit(r)
         g = DeviceLights.to7bit(g)
@@ -135,69 +187,179 @@ class DeviceLights:
         r, g, b = utils.HSVtoRGB(h, s, v)
         return DeviceLights.rgb2int(int(maxrgb*r), int(maxrgb*g), int(maxrgb*b))
     
+    @staticmethod
+    def _convert_color(rgb, variant: int) -> int:
+        """Uncached conversion of an FL color to a packed 7-bit device color."""
+        if variant == DeviceLights.COLOR_FADED:
+            return DeviceLights.mapToClosestHue(rgb, sat=1.0, value=0.02, maxrgb=127)
+        if variant == DeviceLights.COLOR_FULL:
+            return DeviceLights.mapToClosestHue(rgb, sat=1.0, value=0.2, maxrgb=127)
+        return DeviceLights._to7bitColor(rgb)
+    
+    @staticmethod
+    def to_device_color(rgb, variant: int = COLOR_FULL) -> int:
+        """ Convert an FL color to a packed 7-bit device color, using the LRU color cache.
+
+        :param rgb: 24-bit FL color.
+        :param variant: one of COLOR_7BIT, COLOR_FADED or COLOR_FULL.
+        """
+        cache = DeviceLights._color_cache
+        key = (rgb, variant)
+        color = cache.get(key)
+        if color is None:
+            color = cache[key] = DeviceLights._convert_color(rgb, variant)
+            if len(cache) > DeviceLights.COLOR_CACHE_SIZE: cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return color
+    
+    @staticmethod
+    def to_device_colors(rgbs, variant: int = COLOR_FULL) -> list[int]:
+        """ Convert a sequence of FL colors (i.e. the 9 bank colors or the 16 pad colors) in one call.
+
+        :param rgbs: iterable of 24-bit FL colors.
+        :param variant: one of COLOR_7BIT, COLOR_FADED or COLOR_FULL.
+        :return: list of packed 7-bit device colors, in the same order.
+        """
+        cache = DeviceLights._color_cache
+        get = cache.get
+        colors = [get((rgb, variant)) for rgb in rgbs]
+        if None in colors:
+            return [DeviceLights.to_device_color(rgb, variant) for rgb in rgbs]
+        
+        move_to_end = cache.move_to_end
+        for key in dict.fromkeys((rgb, variant) for rgb in rgbs): move_to_end(key)
+        return colors
+    
+    @staticmethod
+    def to7bitColor(color) -> int:
+        return DeviceLights.to_device_color(color, DeviceLights.COLOR_7BIT)
+    
     @staticmethod
     def fadedColor(rgb):
-        return DeviceLights.mapToClosestHue(rgb, sat=1.0, value=0.02, maxrgb=127)
+        return DeviceLights.to_device_color(rgb, DeviceLights.COLOR_FADED)
 
     @staticmethod
     def fullColor(rgb):
-        return DeviceLights.mapToClosestHue(rgb, sat=1.0, value=0.2, maxrgb=127)
+        return DeviceLights.to_device_color(rgb, DeviceLights.COLOR_FULL)
 
     @staticmethod
     def get_pad_led_id(button_id: int):
-        MIDI_DRUM_PAD_DATA1_MIN = 36
-
-        if MKII_88_KEYBOARD or MKII_49_KEYBOARD or config.INVERT_LED_LAYOUT:
-            # On 49/88 keyboard, the button IDs are flipped:
-            # 0x30, 0x31, 0x32, 0x33
-            # 0x2C, 0x2D, 0x2E, 0x2F
-            # 0x28, 0x29, 0x30, 0x31
-            # 0x24, 0x25, 0x26, 0x27
-            idx = button_id - MIDI_DRUM_PAD_DATA1_MIN
-            col = idx % 4
-            row = 3 - (idx // 4)
-            return DeviceLights.MATRIX_IDS_PAD[row][col]
-        return button_id - MIDI_DRUM_PAD_DATA1_MIN + DeviceLights.MATRIX_IDS_PAD[0][0]
-
+        return layout.get_pad_layout().note_to_led[button_id]
+    
     def set_pad_lights(self, matrix_values, rgb: bool = False) -> None:
         """ Set the pad lights given a matrix of color values to set the pad with.
         :param matrix_values: 4x4 array of arrays containing the LED color values.
         """
         # Note: Pad lights can be set to RGB colors, but this doesn't seem to be working.
-        led_map: dict = {}
-        num_rows: int = len(DeviceLights.MATRIX_IDS_PAD)
-        num_cols: int = len(DeviceLights.MATRIX_IDS_PAD[0])
-        for r in range(num_rows):
-            for c in range(num_cols):
-                led_map[DeviceLights.MATRIX_IDS_PAD[r][c]] = matrix_values[r][c]
-
-        self.set_pad_lights(led_map, rgb)
+        self.set_lights(dict(zip(layout.get_pad_layout().matrix_led_ids, chain.from_iterable(matrix_values))), rgb)
     
+    @instrument.timed("set_lights")
     def set_lights(self, led_mapping, rgb: bool=False):
-        """ Given a map of LED ids to color value, construct and send a command with all the led mapping. """
-        time_ms = time.monotonic() * 1000
+        """ Given a map of LED ids to color value, update the desired LED state.
+
+        Nothing is sent here. LEDs that differ from the state last sent to the device are marked dirty and are sent on
+        the next call to flush.
+        """
+        desired = self.desired
+        sent = self.sent
+        dirty = self.dirty
         for led_id, led_value in led_mapping.items():
             # Do not toggle/set lights that are missing
             if led_id == DeviceLights.MISSING: continue
-                
-            if led_id not in self.last_send_ms:
-                self.last_send_ms[led_id] = 0
             
-            # Drop value
-            if time_ms - self.last_send_ms[led_id] < 33: continue
-                
-            self.last_send_ms[led_id] = time_ms
+            if not rgb and 0 <= led_value < 128:
+                state = DeviceLights.MONO_STATES[led_value]
+            else:
+                state = self.get_state(led_value, rgb)
+            pending: bool = led_id in dirty
+            desired[led_id] = state
             
-            if rgb:
-                r, g, b = DeviceLights.int2rgb(led_value)
-                self.send_fn(DeviceLights.SET_RGB_LIGHT_COMMAND + bytes([led_id, r, g, b]))
+            if pending:
+                self.num_coalesced += 1
+                if sent.get(led_id) == state: del dirty[led_id]
+            elif sent.get(led_id) == state:
+                self.num_dropped += 1
             else:
-                self.send_fn(DeviceLights.SET_MONOCHROME_LIGHT_COMMAND + bytes([led_id, led_value]))
+                dirty[led_id] = None
+        
+        if dirty: self.schedule_flush(0)
+    
+    def get_state(self, led_value: int, rgb: bool) -> tuple[int, bool]:
+        """ Get the interned (value, rgb) state of an LED value. Monochrome values outside 0-127 are not interned. """
+        if not rgb:
+            if 0 <= led_value < 128: return DeviceLights.MONO_STATES[led_value]
+            return led_value, False
+        state = self.rgb_states.get(led_value)
+        if state is None:
+            if len(self.rgb_states) >= DeviceLights.MAX_RGB_STATES: self.rgb_states.clear()
+            state = self.rgb_states[led_value] = (led_value, True)
+        return state
+    
+    def schedule_flush(self, time_ms: float) -> None:
+        """ Schedule a flush at time_ms, unless one is already scheduled at or before that time. """
+        if self.scheduler is None: return
+        self.flush_timer = self.scheduler.reschedule(self.flush_timer, time_ms, self.flush)
+    
+    @instrument.timed("flush lights")
+    def flush(self, time_ms: float | None = None) -> int:
+        """ Send the dirty LEDs to the device. Called once per tick.
+
+        At most MAX_LEDS_PER_FLUSH commands are sent per call. LEDs that were sent less than MIN_LED_INTERVAL_MS ago
+        stay pending with their newest value and are sent on a later tick.
+
+        :param time_ms: current timestamp in milliseconds. Defaults to the monotonic clock.
+        :return: the number of LED commands sent.
+        """
+        if not self.dirty: return 0
+        if time_ms is None: time_ms = time.monotonic() * 1000
+        
+        num_sent: int = 0
+        for led_id in list(self.dirty):
+            if num_sent >= DeviceLights.MAX_LEDS_PER_FLUSH: break
+            
+            # Throttle window not expired, keep the value pending
+            last_send_ms = self.last_send_ms.get(led_id)
+            if last_send_ms is not None and time_ms - last_send_ms < DeviceLights.MIN_LED_INTERVAL_MS: continue
             
-            # Need to intentionally sleep to allow time for keyboard to process command sent.
-            time.sleep(0.0001)
+            del self.dirty[led_id]
+            state = self.desired[led_id]
+            led_value, rgb = state
+            if rgb:
+                message = self.rgb_message
+                message[3] = led_id
+                message[4] = (led_value >> 16) & 0xFF
+                message[5] = (led_value >> 8) & 0xFF
+                message[6] = led_value & 0xFF
+                self.send_fn(message, PRIORITY_COSMETIC)
+            else:
+                message = self.mono_message
+                message[3] = led_id
+                message[4] = led_value
+                self.send_fn(message, PRIORITY_COSMETIC if led_id in DeviceLights.PAD_IDS else PRIORITY_CONTROL)
             
+            self.sent[led_id] = state
+            self.last_send_ms[led_id] = time_ms
+            num_sent += 1
+        
+        self.num_sent += num_sent
+        
+        # Wake up again for the LEDs still pending: on the next tick if the batch was full, otherwise when the first
+        # throttle window expires.
+        if self.dirty:
+            if num_sent >= DeviceLights.MAX_LEDS_PER_FLUSH:
+                self.schedule_flush(0)
+            else:
+                first_send_ms = min(self.last_send_ms[led_id] for led_id in self.dirty)
+                self.schedule_flush(first_send_ms + DeviceLights.MIN_LED_INTERVAL_MS)
+        return num_sent
     
+    def invalidate(self) -> None:
+        """ Forget what was sent to the device so that the next flush repaints every LED. """
+        self.sent.clear()
+        self.dirty = dict.fromkeys(self.desired)
+        if self.dirty: self.schedule_flush(0)
+            
     def set_bank_lights(self, array_values, rgb: bool=False):
         """ Set the bank lights given an array of color values to set the bank lights with.
 
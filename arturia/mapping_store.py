@@ -0,0 +1,155 @@
+import os
+
+import debug
+from arturia import config
+
+class KnobMappingStore:
+    """ Knob mappings persisted across FL sessions in an append-only JSON lines file.
+
+    The first line holds the format version, i.e. {"version": 1}. Every other line is one mapping:
+
+        {"plugin": "FLEX", "params": 512, "knobs": [12, 13, 40, 41, 100, 101, 102, 103, 200]}
+
+    Later lines replace earlier ones with the same plugin name and parameter count, so a mapping is updated by appending
+    a line. A mapping with "pinned": true is a manual override: it wins over computed mappings and is never replaced by
+    one. A pinned line may leave out "params" to apply to every parameter count of the plugin, and a pinned line with
+    "knobs": null removes the override.
+
+    The file is read on the first lookup or when load is called, which the device script schedules on its first idle
+    tick so that OnInit is not slowed down.
+    """
+    VERSION: int = 1
+    
+    # The file is rewritten without superseded lines on load once they outnumber the live mappings by this much.
+    COMPACT_THRESHOLD: int = 64
+    
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.loaded: bool = False
+        
+        # Set when the file can't be read or written, or was written by a newer script version. Lookups then only use
+        # the mappings recorded during this session.
+        self.disabled: bool = False
+        
+        # (plugin name, param count) -> knob mapping, computed by the script.
+        self.mappings: dict[tuple[str, int], list[int]] = {}
+        
+        # (plugin name, param count or None) -> knob mapping, pinned by the user.
+        self.pinned: dict[tuple[str, int | None], list[int]] = {}
+    
+    @staticmethod
+    def get_default_path() -> str:
+        """ Path of KNOB_MAPPINGS_FILE in the script folder. """
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), config.KNOB_MAPPINGS_FILE)
+    
+    def load(self) -> None:
+        """ Read the file if it has not been read yet. """
+        if self.loaded: return
+        self.loaded = True
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines: list[str] = f.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            debug.log('MAPPINGS', 'Could not read %s: %s', self.path, e, level=debug.LEVEL_WARNING)
+            self.disabled = True
+            return
+        
+        if not lines: return
+        version = self.parse_line(lines[0])
+        if not isinstance(version, dict) or version.get('version') != KnobMappingStore.VERSION:
+            debug.log('MAPPINGS', 'Ignoring %s: unsupported version.', self.path, level=debug.LEVEL_WARNING)
+            self.disabled = True
+            return
+        
+        for line in lines[1:]:
+            entry = self.parse_line(line)
+            if isinstance(entry, dict): self.apply_entry(entry)
+        
+        if len(lines) - 1 > len(self.mappings) + len(self.pinned) + KnobMappingStore.COMPACT_THRESHOLD:
+            self.compact()
+    
+    @staticmethod
+    def parse_line(line: str):
+        """ Decode one line of the file. Returns None for blank or malformed lines, which are skipped. """
+        line = line.strip()
+        if not line: return None
+        
+        # json is imported on first use, it is not needed until the first idle tick and slows down script reloads.
+        import json
+        try:
+            return json.loads(line)
+        except ValueError:
+            debug.log('MAPPINGS', 'Skipping malformed line: %s', line, level=debug.LEVEL_WARNING)
+            return None
+    
+    def apply_entry(self, entry: dict) -> None:
+        name = entry.get('plugin')
+        count = entry.get('params')
+        knobs = entry.get('knobs')
+        if not isinstance(name, str): return
+        if knobs is not None and not (isinstance(knobs, list) and all(isinstance(i, int) for i in knobs)): return
+        
+        if entry.get('pinned'):
+            key = (name, count if isinstance(count, int) else None)
+            if knobs is None: self.pinned.pop(key, None)
+            else: self.pinned[key] = knobs
+        elif isinstance(count, int) and knobs is not None:
+            self.mappings[(name, count)] = knobs
+    
+    def get(self, key: tuple[str, int]) -> list[int] | None:
+        """ Get the pinned or previously computed knob mapping of a plugin, or None if there is none. """
+        self.load()
+        mapping = self.pinned.get(key)
+        if mapping is None: mapping = self.pinned.get((key[0], None))
+        if mapping is None: mapping = self.mappings.get(key)
+        return mapping
+    
+    def record(self, key: tuple[str, int], mapping: list[int]) -> None:
+        """ Persist a computed knob mapping. Nothing is written if it is already stored. """
+        self.load()
+        if self.mappings.get(key) == mapping: return
+        self.mappings[key] = mapping
+        self.append({'plugin': key[0], 'params': key[1], 'knobs': mapping})
+    
+    def pin(self, name: str, mapping: list[int] | None, count: int | None = None) -> None:
+        """ Pin a manual knob mapping for a plugin, for one parameter count or all of them if count is None.
+
+        Passing None as the mapping removes the override.
+        """
+        self.load()
+        entry: dict = {'plugin': name, 'params': count, 'knobs': mapping, 'pinned': True}
+        self.apply_entry(entry)
+        self.append(entry)
+    
+    def iter_entries(self):
+        yield {'version': KnobMappingStore.VERSION}
+        for (name, count), knobs in self.mappings.items():
+            yield {'plugin': name, 'params': count, 'knobs': knobs}
+        for (name, count), knobs in self.pinned.items():
+            yield {'plugin': name, 'params': count, 'knobs': knobs, 'pinned': True}
+    
+    def append(self, entry: dict) -> None:
+        if self.disabled: return
+        import json
+        try:
+            is_new: bool = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if is_new: f.write(json.dumps({'version': KnobMappingStore.VERSION}) + '\n')
+                f.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            debug.log('MAPPINGS', 'Could not write %s: %s', self.path, e, level=debug.LEVEL_WARNING)
+            self.disabled = True
+    
+    def compact(self) -> None:
+        """ Rewrite the file with only the live mappings. """
+        import json
+        temp_path: str = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry) + '\n' for entry in self.iter_entries())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            debug.log('MAPPINGS', 'Could not compact %s: %s', self.path, e, level=debug.LEVEL_WARNING)
@@ -0,0 +1,105 @@
+from arturia import config, layout
+from arturia.light import DeviceLights
+
+"""Import from FL Studio library"""
+import transport
+import ui
+
+class MetronomeLights:
+    """ Flashes the pads and transport lights on every beat.
+
+    Driven by FL's OnUpdateBeatIndicator, so nothing runs between beats. The beat within the bar is counted from the
+    last bar indicator, so any time signature lines up with FL's bars. Every frame is precomputed, and so is the delta
+    between every pair of frames, so a beat only updates the LEDs that change.
+    """
+    __slots__ = ('lights', 'frames', 'deltas', 'current_frame', 'current_recording', 'beat_in_bar')
+    
+    # Beat indicator values passed to OnUpdateBeatIndicator.
+    BEAT_OFF: int = 0
+    BEAT_BAR: int = 1
+    BEAT_BEAT: int = 2
+    
+    # Frame indices. The first beat of a bar lights all the pads, the other beats light one pad column each, cycling
+    # through the columns in bars longer than 4 beats.
+    FRAME_BAR: int = 0
+    FRAME_FIRST_COLUMN: int = 1
+    FRAME_OFF: int = FRAME_FIRST_COLUMN + layout.NUM_PAD_COLS
+    
+    def __init__(self, lights: DeviceLights) -> None:
+        self.lights: DeviceLights = lights
+        
+        # frames[recording][frame index] -> {led id: value}
+        self.frames: list[list[dict[int, int]]] = [
+            [self.build_frame(frame_idx, recording) for frame_idx in range(MetronomeLights.FRAME_OFF + 1)]
+            for recording in (False, True)
+        ]
+        
+        # deltas[recording][from frame][to frame] -> LEDs that differ in the target frame
+        self.deltas: list[list[list[dict[int, int]]]] = [
+            [[MetronomeLights.diff(src, dst) for dst in frames] for src in frames] for frames in self.frames
+        ]
+        
+        # Frame currently displayed, None when the metronome lights are not shown.
+        self.current_frame: int | None = None
+        self.current_recording: bool = False
+        
+        # Beats since the last bar indicator.
+        self.beat_in_bar: int = 0
+        
+    @staticmethod
+    def build_frame(frame_idx: int, recording: bool) -> dict[int, int]:
+        """ LED values of a frame. On the first beat all the pads light up, on other beats only the beat's column.
+
+        The record light flashes while recording, the play light otherwise.
+        """
+        frame: dict[int, int] = {}
+        is_on: bool = frame_idx != MetronomeLights.FRAME_OFF
+        column: int = frame_idx - MetronomeLights.FRAME_FIRST_COLUMN
+        if config.ENABLE_PAD_METRONOME_LIGHTS:
+            matrix_led_ids: list[int] = layout.get_pad_layout().matrix_led_ids
+            for pos, led_id in enumerate(matrix_led_ids):
+                lit: bool = is_on and (frame_idx == MetronomeLights.FRAME_BAR or pos % layout.NUM_PAD_COLS == column)
+                frame[led_id] = DeviceLights.AsOnOffByte(lit)
+        if config.ENABLE_TRANSPORTS_METRONOME_LIGHTS:
+            # The light that is not flashing is turned off, in case recording started or stopped during playback
+            frame[DeviceLights.ID_TRANSPORTS_PLAY] = DeviceLights.AsOnOffByte(is_on and not recording)
+            frame[DeviceLights.ID_TRANSPORTS_RECORD] = DeviceLights.AsOnOffByte(is_on and recording)
+        return frame
+    
+    @staticmethod
+    def diff(src: dict[int, int], dst: dict[int, int]) -> dict[int, int]:
+        return {led_id: value for led_id, value in dst.items() if src.get(led_id) != value}
+    
+    def is_enabled(self) -> bool:
+        if not (config.ENABLE_PAD_METRONOME_LIGHTS or config.ENABLE_TRANSPORTS_METRONOME_LIGHTS): return False
+        return not config.METRONOME_LIGHTS_ONLY_WHEN_METRONOME_ENABLED or ui.isMetronomeEnabled()
+    
+    def on_beat(self, value: int) -> None:
+        """ Handle FL's OnUpdateBeatIndicator. """
+        if not self.is_enabled(): return
+        
+        if value == MetronomeLights.BEAT_OFF:
+            frame_idx: int = MetronomeLights.FRAME_OFF
+        elif value == MetronomeLights.BEAT_BAR:
+            self.beat_in_bar = 0
+            frame_idx = MetronomeLights.FRAME_BAR
+        else:
+            self.beat_in_bar += 1
+            frame_idx = MetronomeLights.FRAME_FIRST_COLUMN + self.beat_in_bar % layout.NUM_PAD_COLS
+        self.show_frame(frame_idx, transport.isRecording())
+    
+    def show_frame(self, frame_idx: int, recording: bool) -> None:
+        if self.current_frame is None or recording != self.current_recording:
+            leds: dict[int, int] = self.frames[recording][frame_idx]
+        else:
+            leds = self.deltas[recording][self.current_frame][frame_idx]
+        if leds: self.lights.set_lights(leds)
+        self.current_frame = frame_idx
+        self.current_recording = recording
+    
+    def stop(self) -> None:
+        """ Turn off the metronome lights, i.e. when playback stops. """
+        self.beat_in_bar = 0
+        if self.current_frame is None: return
+        self.show_frame(MetronomeLights.FRAME_OFF, self.current_recording)
+        self.current_frame = None
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+from arturia import config
+from arturia.display import DeviceDisplay
+
+"""Import from FL Studio library"""
+import channels
+import general
+import midi
+import mixer
+import patterns
+
+if general.getVersion() >= 8:
+    import plugins
+
+class CachedName(namedtuple('CachedName', ('text', 'encoded'))):
+    """ A name as shown on the display: abbreviated to the display width (text) and already encoded (encoded). """
+    __slots__ = ()
+
+class NameCache:
+    """ Display-ready names of patterns, channels, mixer tracks and plugin parameters.
+
+    Each name is queried from FL, abbreviated, upper cased if HINT_DISPLAY_ALL_CAPS is set, and encoded once. Entries
+    are dropped on the OnRefresh flags that can rename them, so scrolling with the nav wheel renders from cached bytes.
+    """
+    KIND_PATTERN: int = 0
+    KIND_CHANNEL: int = 1
+    KIND_MIXER_TRACK: int = 2
+    KIND_PLUGIN_PARAM: int = 3
+    
+    # Refresh flags that invalidate each kind of name.
+    DIRTY_MASKS: dict[int, int] = {
+        KIND_PATTERN: midi.HW_Dirty_Names | midi.HW_Dirty_Patterns,
+        KIND_CHANNEL: midi.HW_Dirty_Names | midi.HW_ChannelEvent,
+        KIND_MIXER_TRACK: midi.HW_Dirty_Names | midi.HW_Dirty_Mixer_Display,
+        KIND_PLUGIN_PARAM: midi.HW_Dirty_Names | midi.HW_Dirty_FocusedWindow | midi.HW_ChannelEvent,
+    }
+    DIRTY_MASK: int = (midi.HW_Dirty_Names | midi.HW_Dirty_Patterns | midi.HW_ChannelEvent | midi.HW_Dirty_Mixer_Display
+                       | midi.HW_Dirty_FocusedWindow)
+    
+    def __init__(self) -> None:
+        # One dict per kind: key -> CachedName. Plugin parameters are keyed by (plugin index, param index).
+        self.names: list[dict] = [{}, {}, {}, {}]
+        
+    @staticmethod
+    def prepare(name: str) -> CachedName:
+        text: str = DeviceDisplay.abbreviate(name)
+        if config.HINT_DISPLAY_ALL_CAPS: text = text.upper()
+        return CachedName(text, DeviceDisplay.encode_line(text))
+    
+    @staticmethod
+    def fetch(kind: int, key) -> str:
+        if kind == NameCache.KIND_PATTERN: return patterns.getPatternName(key)
+        if kind == NameCache.KIND_CHANNEL: return channels.getChannelName(key)
+        if kind == NameCache.KIND_MIXER_TRACK: return mixer.getTrackName(key)
+        plugin_idx, param_idx = key
+        return plugins.getParamName(param_idx, plugin_idx)
+    
+    def get(self, kind: int, key) -> CachedName:
+        """ Get a display-ready name, querying FL only the first time. """
+        names: dict = self.names[kind]
+        name = names.get(key)
+        if name is None:
+            name = names[key] = NameCache.prepare(NameCache.fetch(kind, key))
+        return name
+    
+    def get_pattern(self, index: int) -> CachedName:
+        return self.get(NameCache.KIND_PATTERN, index)
+    
+    def get_channel(self, index: int) -> CachedName:
+        return self.get(NameCache.KIND_CHANNEL, index)
+    
+    def get_mixer_track(self, index: int) -> CachedName:
+        return self.get(NameCache.KIND_MIXER_TRACK, index)
+    
+    def get_plugin_param(self, plugin_idx: int, param_idx: int) -> CachedName:
+        return self.get(NameCache.KIND_PLUGIN_PARAM, (plugin_idx, param_idx))
+    
+    def on_refresh(self, flags: int) -> None:
+        """ Drop the names that may have changed according to the OnRefresh flags. """
+        for kind, mask in NameCache.DIRTY_MASKS.items():
+            if flags & mask: self.names[kind].clear()
+    
+    def clear(self) -> None:
+        for names in self.names:
+            names.clear()
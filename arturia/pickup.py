@@ -0,0 +1,84 @@
+from arturia import config
+
+class MixerPickup:
+    """ Pickup (soft takeover) state of the mixer sliders.
+
+    A slider only takes control of its track once it has matched or crossed the value the track has in FL, so that
+    touching a slider does not make the volume jump. The state of every track and slider is kept in preallocated flat
+    arrays, indexed by track * NUM_SLIDERS + slider, and FL values are refreshed from OnRefresh rather than queried per
+    slider event.
+
+    FL reports the volume changes made by the script itself through OnRefresh as well, a tick or more after they were
+    sent. The last value sent to each track is kept, so that these reports do not take control away from a slider
+    that has already moved on.
+    """
+    __slots__ = ('hardware_values', 'fl_values', 'latched', 'sent_values')
+    
+    NUM_TRACKS: int = 127
+    NUM_SLIDERS: int = 9
+    
+    # Marks a value that is not known yet.
+    UNKNOWN: int = 0xFF
+    
+    # Difference in slider steps at which a slider and FL are considered to match.
+    TOLERANCE: int = 1
+    
+    def __init__(self) -> None:
+        size: int = MixerPickup.NUM_TRACKS * MixerPickup.NUM_SLIDERS
+        
+        # Last value sent by the slider, 0 - 127.
+        self.hardware_values: bytearray = bytearray([MixerPickup.UNKNOWN]) * size
+        
+        # Last value of the track in FL, scaled to the slider range.
+        self.fl_values: bytearray = bytearray([MixerPickup.UNKNOWN]) * size
+        
+        # 1 while the slider is in control of its track.
+        self.latched: bytearray = bytearray(size)
+        
+        # Last value the script sent to each track, in the slider range.
+        self.sent_values: bytearray = bytearray([MixerPickup.UNKNOWN]) * MixerPickup.NUM_TRACKS
+        
+    @staticmethod
+    def volume_to_slider(volume: float) -> int:
+        """ Scale an FL mixer volume (0 - 1.0, where 0.8 is 100%) to the slider range. """
+        slider_value: int = int(round(volume * 125.0 / config.MAX_MIXER_VOLUME * 127))
+        return max(0, min(slider_value, 127))
+    
+    def on_hardware_value(self, track: int, slider: int, value: int) -> bool:
+        """ Record a slider move and return True if the slider is in control of the track. """
+        idx: int = track * MixerPickup.NUM_SLIDERS + slider
+        if self.latched[idx]:
+            self.fl_values[idx] = value
+            self.hardware_values[idx] = value
+            return True
+        
+        fl_value: int = self.fl_values[idx]
+        last_value: int = self.hardware_values[idx]
+        self.hardware_values[idx] = value
+        if fl_value == MixerPickup.UNKNOWN or abs(value - fl_value) <= MixerPickup.TOLERANCE or (
+                last_value != MixerPickup.UNKNOWN and (last_value < fl_value) != (value < fl_value)):
+            self.latched[idx] = 1
+            self.fl_values[idx] = value
+            return True
+        return False
+    
+    def on_sent_value(self, track: int, value: int) -> None:
+        """ Record a value the script sent to the track in FL. """
+        self.sent_values[track] = value
+    
+    def on_fl_value(self, track: int, slider: int, value: int) -> None:
+        """ Record the value of the track in FL. A slider loses control when FL moves away from the value the script
+        last sent, i.e. when the volume is changed with the mouse or automation.
+        """
+        idx: int = track * MixerPickup.NUM_SLIDERS + slider
+        if self.latched[idx] and abs(value - self.sent_values[track]) <= MixerPickup.TOLERANCE: return
+        if abs(value - self.fl_values[idx]) > MixerPickup.TOLERANCE:
+            self.latched[idx] = 0
+        self.fl_values[idx] = value
+    
+    def reset(self) -> None:
+        size: int = len(self.latched)
+        self.hardware_values[:] = bytearray([MixerPickup.UNKNOWN]) * size
+        self.fl_values[:] = bytearray([MixerPickup.UNKNOWN]) * size
+        self.latched[:] = bytearray(size)
+        self.sent_values[:] = bytearray([MixerPickup.UNKNOWN]) * MixerPickup.NUM_TRACKS
@@ -0,0 +1,43 @@
+from collections.abc import Callable
+
+class RefreshCoordinator:
+    """ Routes FL's OnRefresh dirty flags to the subsystems that depend on them.
+
+    Flags are accumulated and dispatched once per idle tick, so a burst of OnRefresh calls (i.e. while a project loads)
+    runs each dependent subsystem at most once, and only if one of its flags is set.
+    """
+    __slots__ = ('scheduler', 'subscribers', 'pending_flags', 'timer')
+    
+    def __init__(self, scheduler=None) -> None:
+        # Optional Scheduler used to coalesce flags until the next tick. Without it, flags are dispatched right away.
+        self.scheduler = scheduler
+        
+        # (flags mask, callback_fn) in subscription order.
+        self.subscribers: list[tuple[int, Callable[[int], None]]] = []
+        
+        # Union of the flags received since the last dispatch.
+        self.pending_flags: int = 0
+        self.timer: list | None = None
+        
+    def subscribe(self, mask: int, callback_fn: Callable[[int], None]) -> "RefreshCoordinator":
+        """ Call callback_fn with the dirty flags it subscribed to whenever any of the flags in mask is set. """
+        self.subscribers.append((mask, callback_fn))
+        return self
+    
+    def on_refresh(self, flags: int) -> None:
+        """ Handle FL's OnRefresh. """
+        self.pending_flags |= flags
+        if self.scheduler is None:
+            self.dispatch()
+        elif self.timer is None:
+            self.timer = self.scheduler.call_at(0, self.dispatch)
+    
+    def dispatch(self) -> None:
+        """ Call the subscribers of the pending flags. """
+        self.timer = None
+        flags: int = self.pending_flags
+        self.pending_flags = 0
+        if not flags: return
+        
+        for mask, callback_fn in self.subscribers:
+            if flags & mask: callback_fn(flags & mask)
@@ -0,0 +1,95 @@
+import heapq
+import time
+from collections.abc import Callable
+
+class Scheduler:
+    """ Fires callbacks when their deadline is reached. Driven by the device script's OnIdle.
+
+    Timers are kept in a heap ordered by deadline, so a tick with nothing due costs a single comparison.
+    """
+    __slots__ = ('queue', 'sequence')
+    
+    def __init__(self) -> None:
+        # Heap of timers: [deadline ms, sequence number, callback]. A cancelled timer has its callback set to None.
+        self.queue: list[list] = []
+        
+        # Sequence number of the next timer. Keeps timers with the same deadline in scheduling order.
+        self.sequence: int = 0
+    
+    def call_at(self, time_ms: float, callback_fn: Callable[[], None]) -> list:
+        """ Schedule callback_fn to be called on the first tick at or after time_ms.
+
+        :param time_ms: the deadline, in the same clock as get_timestamp_ms. 0 means on the next tick.
+        :param callback_fn: function called without arguments.
+        :return: the timer, which can be passed to cancel.
+        """
+        timer: list = [time_ms, self.sequence, callback_fn]
+        self.sequence += 1
+        heapq.heappush(self.queue, timer)
+        return timer
+    
+    def call_later(self, delay_ms: float, callback_fn: Callable[[], None]) -> list:
+        """ Schedule callback_fn to be called delay_ms from now. See call_at for more details. """
+        return self.call_at(Scheduler.get_timestamp_ms() + delay_ms, callback_fn)
+    
+    @staticmethod
+    def cancel(timer: list) -> None:
+        """ Cancel a timer returned by call_at/call_later. Cancelling a timer that already fired does nothing. """
+        timer[2] = None
+    
+    @staticmethod
+    def is_pending(timer: list | None) -> bool:
+        """ Returns True if the timer has neither fired nor been cancelled. """
+        return timer is not None and timer[2] is not None
+    
+    def reschedule(self, timer: list | None, time_ms: float, callback_fn: Callable[[], None]) -> list:
+        """ Make sure callback_fn is called at or before time_ms.
+
+        If timer is still pending with a deadline at or before time_ms it is kept, otherwise it is cancelled and a new
+        timer is scheduled at time_ms.
+
+        :param timer: the timer previously returned for callback_fn, or None.
+        :return: the timer that is now pending.
+        """
+        if Scheduler.is_pending(timer):
+            if timer[0] <= time_ms: return timer
+            Scheduler.cancel(timer)
+        return self.call_at(time_ms, callback_fn)
+    
+    def next_deadline_ms(self) -> float | None:
+        """ Get the deadline of the earliest pending timer, or None if there are no timers. """
+        queue: list[list] = self.queue
+        while queue and queue[0][2] is None:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else None
+    
+    def tick(self, time_ms: float | None = None) -> int:
+        """ Fire all the timers that are due.
+
+        Timers scheduled by the fired callbacks are not fired before the next tick, even if they are already due.
+
+        :param time_ms: current timestamp in milliseconds. Defaults to the monotonic clock.
+        :return: the number of callbacks fired.
+        """
+        queue: list[list] = self.queue
+        if not queue: return 0
+        if time_ms is None: time_ms = Scheduler.get_timestamp_ms()
+        if queue[0][0] > time_ms: return 0
+        
+        due: list[list] = []
+        while queue and queue[0][0] <= time_ms:
+            due.append(heapq.heappop(queue))
+        
+        num_fired: int = 0
+        for timer in due:
+            callback_fn = timer[2]
+            if callback_fn is None: continue
+            timer[2] = None
+            callback_fn()
+            num_fired += 1
+        return num_fired
+    
+    @staticmethod
+    def get_timestamp_ms() -> float:
+        """ Get the current timestamp in milliseconds"""
+        return time.monotonic() * 1000
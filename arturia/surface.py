@@ -0,0 +1,67 @@
+from collections import OrderedDict, namedtuple
+
+"""Import from FL Studio library"""
+import midi
+
+class SurfaceState(namedtuple('SurfaceState', ('leds', 'line1', 'line2', 'knobs_mapping'))):
+    """ Immutable snapshot of what the device surface shows for one input mode and page.
+
+    leds holds (led id, value, rgb) for every LED owned by the input controls, sorted by led id. knobs_mapping is a
+    tuple of parameter indices.
+    """
+    __slots__ = ()
+
+class SurfaceCache:
+    """ Bounded LRU of surface snapshots keyed by (input mode, page).
+
+    Each snapshot is stored with the FL refresh flags it depends on, and is dropped when OnRefresh reports one of them.
+    """
+    MAX_SNAPSHOTS: int = 32
+    
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS) -> None:
+        self.max_snapshots: int = max_snapshots
+        
+        # (mode, page) -> (SurfaceState, dirty flags mask)
+        self.snapshots: OrderedDict[tuple[int, int], tuple[SurfaceState, int]] = OrderedDict()
+        
+    def get(self, mode: int, page: int) -> SurfaceState | None:
+        entry = self.snapshots.get((mode, page))
+        if entry is None: return None
+        self.snapshots.move_to_end((mode, page))
+        return entry[0]
+    
+    def put(self, mode: int, page: int, state: SurfaceState, dirty_mask: int) -> None:
+        key = (mode, page)
+        self.snapshots[key] = (state, dirty_mask)
+        self.snapshots.move_to_end(key)
+        if len(self.snapshots) > self.max_snapshots: self.snapshots.popitem(last=False)
+    
+    def invalidate(self, flags: int) -> None:
+        """ Drop the snapshots depending on any of the given OnRefresh flags. """
+        stale = [key for key, (_, dirty_mask) in self.snapshots.items() if dirty_mask & flags]
+        for key in stale:
+            del self.snapshots[key]
+    
+    def clear(self) -> None:
+        self.snapshots.clear()
+
+def capture(led_ids, lights, display, knobs_mapping) -> SurfaceState:
+    """ Snapshot the desired state of the given LEDs, the display lines and the knob mapping. """
+    desired = lights.desired
+    leds = tuple((led_id,) + desired[led_id] for led_id in sorted(led_ids) if led_id in desired)
+    return SurfaceState(leds, display.line1, display.line2, tuple(knobs_mapping))
+
+def restore(state: SurfaceState, lights, display) -> None:
+    """ Apply a snapshot. Only LEDs and display content that differ from the device end up being sent. """
+    mono = {led_id: value for led_id, value, rgb in state.leds if not rgb}
+    colors = {led_id: value for led_id, value, rgb in state.leds if rgb}
+    if mono: lights.set_lights(mono)
+    if colors: lights.set_lights(colors, rgb=True)
+    if state.line1 != display.line1 or state.line2 != display.line2:
+        display.set_lines(state.line1, state.line2)
+
+# Refresh flags each input mode's surface depends on.
+DIRTY_MASK_CHANNEL_PLUGINS: int = (midi.HW_Dirty_FocusedWindow | midi.HW_Dirty_RemoteLinks | midi.HW_Dirty_Names
+                                   | midi.HW_Dirty_Colors | midi.HW_ChannelEvent)
+DIRTY_MASK_MIXER_OVERVIEW: int = (midi.HW_Dirty_Mixer_Sel | midi.HW_Dirty_Mixer_Display | midi.HW_Dirty_Names
+                                  | midi.HW_Dirty_Colors)
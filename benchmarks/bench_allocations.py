@@ -0,0 +1,159 @@
+"""Memory allocated per midi event and idle tick in steady state, measured with tracemalloc against the offline FL
+stand-in.
+
+Every call is measured on its own: the peak of traced memory during the call, over the memory in use before it, is the
+most the call had allocated at once. Memory still held after the replay is reported separately as retained.
+
+Usage: python benchmarks/bench_allocations.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import streams
+
+clock = simulator.install()
+
+import device
+import general
+import transport
+
+from arturia.dispatch import MidiEventDispatcher, SysexTransport
+from arturia.display import DeviceDisplay
+from arturia.encoder import DeviceInputControls
+from arturia.light import DeviceLights
+from arturia.metronome import MetronomeLights
+from arturia.scheduler import Scheduler
+
+NUM_EVENTS = 20000
+IDLE_INTERVAL_MS = 20
+
+
+class CallAllocations:
+    """ Number of calls, number of calls that allocated, and the sum and max of their peak allocated bytes. """
+    __slots__ = ('fn', 'num_calls', 'num_allocating', 'total_bytes', 'max_bytes')
+    
+    # Peak bytes of a call that allocates nothing, i.e. the values returned by tracemalloc itself. Set by calibrate.
+    overhead_bytes: int = 0
+    
+    def __init__(self, fn) -> None:
+        self.fn = fn
+        self.num_calls: int = 0
+        self.num_allocating: int = 0
+        self.total_bytes: int = 0
+        self.max_bytes: int = 0
+    
+    @staticmethod
+    def calibrate() -> None:
+        noop = CallAllocations(lambda *args: None)
+        CallAllocations.overhead_bytes = min(noop.traced_bytes() for _ in range(100))
+    
+    def traced_bytes(self, *args) -> int:
+        tracemalloc.reset_peak()
+        before_bytes, _ = tracemalloc.get_traced_memory()
+        self.fn(*args)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        return peak_bytes - before_bytes - CallAllocations.overhead_bytes
+    
+    def __call__(self, *args) -> None:
+        num_bytes: int = self.traced_bytes(*args)
+        self.num_calls += 1
+        if num_bytes > 0:
+            self.num_allocating += 1
+            self.total_bytes += num_bytes
+            if num_bytes > self.max_bytes: self.max_bytes = num_bytes
+    
+    def report(self, name: str) -> None:
+        print('    %-28s %d of %d (%.1f%%)' % ('allocating ' + name, self.num_allocating, self.num_calls,
+                                               100.0 * self.num_allocating / max(self.num_calls, 1)))
+        print('    %-28s mean %.2f bytes | max %d bytes' % ('allocated per ' + name[:-1],
+                                                            self.total_bytes / max(self.num_calls, 1), self.max_bytes))
+
+
+def process_rec_event(event_id, value, flags):
+    """ processRECEvent of the FL stand-in, without recording the call. """
+    general.rec_values[event_id] = value
+    return value
+
+
+def measure(title: str, events: list, on_event, on_idle) -> None:
+    """ Replay events twice: once to warm up caches and buffers, then under tracemalloc. """
+    simulator.replay(events, on_event, on_idle, clock, IDLE_INTERVAL_MS)
+    device.sysex_log.clear()
+    general.rec_events.clear()
+    
+    # The FL stand-ins record every sysex message and recorded event, which is not memory the script allocates
+    midi_out_sysex, general_process_rec_event = device.midiOutSysex, general.processRECEvent
+    device.midiOutSysex = lambda message: None
+    general.processRECEvent = process_rec_event
+    traced_event = CallAllocations(on_event)
+    traced_idle = CallAllocations(on_idle)
+    tracemalloc.start()
+    try:
+        CallAllocations.calibrate()
+        before = tracemalloc.take_snapshot()
+        simulator.replay(events, traced_event, traced_idle, clock, IDLE_INTERVAL_MS)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        device.midiOutSysex, general.processRECEvent = midi_out_sysex, general_process_rec_event
+    
+    stats = [stat for stat in after.compare_to(before, 'filename')
+             if stat.traceback[0].filename not in (tracemalloc.__file__, __file__)]
+    retained_blocks: int = sum(stat.count_diff for stat in stats)
+    retained_bytes: int = sum(stat.size_diff for stat in stats)
+    print(title)
+    print('    %-28s %d' % ('events', len(events)))
+    traced_event.report('events')
+    traced_idle.report('ticks')
+    print('    %-28s %.3f blocks, %.2f bytes' % ('retained per event', retained_blocks / len(events),
+                                                  retained_bytes / len(events)))
+    for stat in stats[:3]:
+        print('    %-28s %+d blocks, %+d bytes' % (os.path.basename(stat.traceback[0].filename), stat.count_diff,
+                                                   stat.size_diff))
+    print()
+
+
+def bench_knobs() -> None:
+    """ Knob turns dispatched to queued plugin parameter changes. """
+    scheduler = Scheduler()
+    sysex_transport = SysexTransport()
+    display = DeviceDisplay(sysex_transport.send, scheduler)
+    controls = DeviceInputControls(display, scheduler)
+    dispatcher = MidiEventDispatcher(lambda event: event.data1)
+    dispatcher.new_handler_for_keys(
+        streams.KNOB_CONTROL_IDS,
+        lambda event: controls.queue_mixer_param(event.data1 - streams.KNOB_CONTROL_IDS[0], 1, incremental=True))
+    dispatcher.freeze()
+    
+    def on_idle() -> None:
+        scheduler.tick()
+        sysex_transport.flush()
+    
+    events = list(streams.knob_turns(NUM_EVENTS * 2, rate_hz=500))
+    measure('Knob turns', events, dispatcher.dispatch, on_idle)
+
+
+def bench_metronome() -> None:
+    """ Metronome lights at 200 BPM. """
+    scheduler = Scheduler()
+    sysex_transport = SysexTransport()
+    lights = DeviceLights(sysex_transport.send, scheduler)
+    metronome = MetronomeLights(lights)
+    transport.start()
+    
+    def on_idle() -> None:
+        scheduler.tick()
+        sysex_transport.flush()
+    
+    events = list(streams.beat_indicator(200, NUM_EVENTS * 150))
+    measure('Metronome lights', events, metronome.on_beat, on_idle)
+    transport.stop()
+
+
+if __name__ == '__main__':
+    bench_knobs()
+    bench_metronome()
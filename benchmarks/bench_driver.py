@@ -0,0 +1,144 @@
+"""Latency and bandwidth benchmarks of the driver under realistic loads, run against the offline FL stand-in.
+
+Usage: python benchmarks/bench_driver.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import streams
+from simulator.stats import summarize, sysex_rate
+
+clock = simulator.install()
+
+import device
+import general
+import plugins
+import transport
+
+from arturia import encoder
+from arturia.dispatch import MidiEventDispatcher
+from arturia.display import DeviceDisplay
+from arturia.encoder import DeviceInputControls
+from arturia.light import DeviceLights
+from arturia.metronome import MetronomeLights
+from arturia.scheduler import Scheduler
+
+DURATION_MS = 10000
+
+
+def timed(fn, durations_us: list[float]):
+    """ Wrap fn so that every call appends its duration in microseconds to durations_us. """
+    perf_counter = time.perf_counter
+    def wrapper(*args, **kwargs):
+        begin_s: float = perf_counter()
+        result = fn(*args, **kwargs)
+        durations_us.append((perf_counter() - begin_s) * 1e6)
+        return result
+    return wrapper
+
+
+def report(title: str, rows: list[tuple[str, str]]) -> None:
+    print(title)
+    for name, value in rows:
+        print('    %-28s %s' % (name, value))
+    print()
+
+
+def bench_dispatch() -> None:
+    """ Per-event dispatch cost with a handler on every controller number, before and after freeze. """
+    rows: list[tuple[str, str]] = []
+    for frozen in (False, True):
+        dispatcher = MidiEventDispatcher(lambda event: event.data1)
+        dispatcher.new_handler_for_keys(range(128), lambda event: None)
+        if frozen: dispatcher.freeze()
+        events = [event for _, event in streams.knob_turns(DURATION_MS, rate_hz=2000)]
+        durations_us = simulator.replay(((0, event) for event in events), dispatcher.dispatch)
+        rows.append(('frozen' if frozen else 'dict lookup', summarize(durations_us)))
+    report('MidiEventDispatcher.dispatch', rows)
+
+
+def bench_metronome(bpm: float = 200.0) -> None:
+    """ Pad and transport metronome lights driven by the beat indicator, flushed from idle ticks. """
+    device.sysex_log.clear()
+    scheduler = Scheduler()
+    lights = DeviceLights(scheduler=scheduler)
+    set_lights_us: list[float] = []
+    set_lights = DeviceLights.set_lights
+    DeviceLights.set_lights = timed(set_lights, set_lights_us)
+    metronome = MetronomeLights(lights)
+    transport.tempo_bpm = bpm
+    transport.start()
+    
+    durations_us = simulator.replay(streams.beat_indicator(bpm, DURATION_MS), metronome.on_beat, scheduler.tick, clock)
+    transport.stop()
+    DeviceLights.set_lights = set_lights
+    messages_per_s, bytes_per_s = sysex_rate(device.sysex_log, DURATION_MS)
+    report('Metronome lights at %d BPM' % bpm, [
+        ('on_beat', summarize(durations_us)),
+        ('set_lights', summarize(set_lights_us)),
+        ('sysex', '%.1f msg/s, %.1f bytes/s' % (messages_per_s, bytes_per_s)),
+        ('updates', 'sent %d, coalesced %d, dropped %d' % (
+            lights.num_sent, lights.num_coalesced, lights.num_dropped)),
+    ])
+
+
+def bench_slider_sweep() -> None:
+    """ Nine sliders swept continuously at 1000 messages per second. """
+    general.rec_events.clear()
+    scheduler = Scheduler()
+    controls = DeviceInputControls(scheduler=scheduler)
+    
+    def on_slider(event) -> None:
+        controls.queue_mixer_param(0, event.data2, track_index=event.midiChan + 1)
+    
+    durations_us = simulator.replay(streams.slider_sweep(DURATION_MS), on_slider, scheduler.tick, clock)
+    report('Slider sweep at 1000 msg/s', [
+        ('per event', summarize(durations_us)),
+        ('FL updates', '%d for %d events' % (len(general.rec_events), len(durations_us))),
+    ])
+
+
+def bench_display() -> None:
+    """ Display refreshes with static text, then with a scrolling line. """
+    device.sysex_log.clear()
+    display = DeviceDisplay()
+    refresh_us: list[float] = []
+    refresh = timed(display.refresh_display, refresh_us)
+    rows: list[tuple[str, str]] = []
+    for line2 in ('Static text', 'A line that is too long to fit and scrolls'):
+        refresh_us.clear()
+        display.set_lines('Channel Plugin', line2)
+        for _ in range(DURATION_MS // 20):
+            clock.advance_ms(20)
+            refresh()
+        rows.append(('scrolling' if len(line2) > 16 else 'static', summarize(refresh_us)))
+    rows.append(('sysex', '%d messages' % len(device.sysex_log)))
+    report('DeviceDisplay.refresh_display every 20 ms', rows)
+
+
+def bench_knobs_mapping(num_params: int = 3000) -> None:
+    """ Knob mapping of a large plugin, on first focus and on repeated focus. """
+    plugins.set_plugin(0, 'Large Synth', streams.large_plugin_params(num_params))
+    durations_us: list[float] = []
+    generate = timed(encoder.generate_knobs_mapping, durations_us)
+    generate(0)
+    cold_calls: int = plugins.param_name_calls
+    for _ in range(100):
+        generate(0)
+    report('generate_knobs_mapping with %d params' % num_params, [
+        ('first focus', summarize(durations_us[:1])),
+        ('repeated focus', summarize(durations_us[1:])),
+        ('getParamName calls', '%d' % cold_calls),
+    ])
+
+
+if __name__ == '__main__':
+    bench_dispatch()
+    bench_metronome()
+    bench_slider_sweep()
+    bench_display()
+    bench_knobs_mapping()
@@ -0,0 +1,72 @@
+"""Script load time, as seen when FL Studio (re)loads the device script, run against the offline FL stand-in.
+
+Every run loads the script in a fresh interpreter. The first run compiles the modules, the following runs load them from
+the bytecode cache like a script reload does.
+
+Usage: python benchmarks/bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+
+from simulator.stats import percentile
+
+NUM_RUNS = 20
+
+# Modules that are slow to import and should stay out of the startup path.
+HEAVY_MODULES = ('typing', 're', 'json', 'functools')
+
+# Loads the device script once and prints the startup phases, the modules it loaded and the heavy modules it pulled in.
+LOAD_SCRIPT = '''
+import json, sys, time
+start_s = time.perf_counter()
+import simulator
+simulator.install(virtual_time=False)
+modules_before = set(sys.modules)
+import device_arturia_keylab_mkii as script
+script.OnInit()
+from arturia import instrument
+phases = dict(instrument.startup_ms, total=(time.perf_counter() - start_s) * 1000)
+loaded = sorted(set(sys.modules) - modules_before)
+print(json.dumps({'phases': phases, 'loaded': loaded, 'heavy': [m for m in %r if m in loaded]}))
+''' % (HEAVY_MODULES,)
+
+
+def load_script(pycache_path: str) -> dict:
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache_path)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    output: str = subprocess.run([sys.executable, '-c', LOAD_SCRIPT], cwd=REPO_PATH, env=env, check=True,
+                                 capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def report(title: str, runs: list[dict]) -> None:
+    print(title)
+    for phase in runs[0]['phases']:
+        values: list[float] = [run['phases'][phase] for run in runs]
+        print('    %-28s p50 %8.2f ms | max %8.2f ms | n %d' % (
+            phase, percentile(values, 0.5), max(values), len(values)))
+    print()
+
+
+def bench_startup() -> None:
+    with tempfile.TemporaryDirectory() as pycache_path:
+        cold: dict = load_script(pycache_path)
+        warm: list[dict] = [load_script(pycache_path) for _ in range(NUM_RUNS)]
+    
+    report('Script load without bytecode cache', [cold])
+    report('Script reload', warm)
+    print('Modules loaded')
+    print('    %-28s %d' % ('arturia', sum(name.startswith('arturia') for name in cold['loaded'])))
+    print('    %-28s %d' % ('total', len(cold['loaded'])))
+    print('    %-28s %s' % ('heavy', ', '.join(cold['heavy']) or 'none'))
+    print()
+
+
+if __name__ == '__main__':
+    bench_startup()
@@ -0,0 +1,361 @@
+"""Behaviour checks of driver paths that are not reached by the benchmarks, run against the offline FL stand-in.
+
+Usage: python benchmarks/check_driver.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simulator
+from simulator import MidiEvent
+
+clock = simulator.install()
+
+import channels
+import general
+import midi
+import mixer
+import patterns
+import transport
+
+from arturia import config
+from arturia.dispatch import MidiEventDispatcher, SysexTransport, PRIORITY_DISPLAY, PRIORITY_CONTROL, \
+    PRIORITY_COSMETIC
+from arturia.display import DeviceDisplay
+from arturia.encoder import DeviceInputControls
+from arturia.light import DeviceLights
+from arturia.mapping_store import KnobMappingStore
+from arturia.metronome import MetronomeLights
+from arturia.names import NameCache
+from arturia.pickup import MixerPickup
+from arturia.refresh import RefreshCoordinator
+from arturia.scheduler import Scheduler
+
+
+def new_controls() -> tuple[DeviceInputControls, Scheduler]:
+    scheduler = Scheduler()
+    lights = DeviceLights(lambda data, priority=0: None, scheduler)
+    display = DeviceDisplay(lambda data, priority=0: None, scheduler)
+    return DeviceInputControls(display, scheduler, lights), scheduler
+
+
+def tick(scheduler: Scheduler, num_ticks: int = 1) -> None:
+    for _ in range(num_ticks):
+        clock.advance_ms(20)
+        scheduler.tick()
+
+
+def check_dispatch() -> None:
+    """ Priorities, filters, re-registration and freeze give the same results with and without the compiled table. """
+    calls: list[str] = []
+    
+    def handler(name: str):
+        return lambda event: calls.append(name)
+    
+    dispatcher = MidiEventDispatcher(lambda event: event.data1)
+    dispatcher.new_handler(20, handler('low'))
+    dispatcher.new_handler(20, handler('high'), lambda event: event.data2 > 64, priority=1)
+    dispatcher.new_handler(21, handler('first'))
+    dispatcher.new_handler(21, handler('replaced'))
+    dispatcher.new_handler(300, handler('outside table'))
+    
+    for frozen in (False, True):
+        if frozen: dispatcher.freeze()
+        calls.clear()
+        for data1, data2 in ((20, 100), (20, 10), (21, 0), (300, 0)):
+            assert dispatcher.dispatch(MidiEvent(0xB0, data1, data2))
+        assert not dispatcher.dispatch(MidiEvent(0xB0, 22, 0))
+        assert calls == ['high', 'low', 'replaced', 'outside table'], (frozen, calls)
+    
+    # Registering after freeze invalidates the compiled table
+    dispatcher.new_handler(22, handler('late'))
+    calls.clear()
+    assert dispatcher.dispatch(MidiEvent(0xB0, 22, 0)) and calls == ['late']
+    dispatcher.freeze()
+    
+    # Events dropped by every filter are still handled
+    calls.clear()
+    dispatcher.new_handler(20, handler('low'), lambda event: False)
+    assert dispatcher.dispatch(MidiEvent(0xB0, 20, 10)) and calls == []
+
+
+def check_transport_targets() -> None:
+    """ Mono and RGB messages to the same LED replace each other, across priorities. Display updates are one target. """
+    sent: list[bytes] = []
+    transport = SysexTransport(send_fn=sent.append)
+    mono_on = bytes([0x02, 0x00, 0x10, DeviceLights.ID_BANK_NEXT, 0x7F])
+    rgb_off = bytes([0x02, 0x00, 0x16, DeviceLights.ID_BANK_NEXT, 0x00, 0x00, 0x00])
+    transport.send(rgb_off, PRIORITY_COSMETIC)
+    transport.send(mono_on, PRIORITY_CONTROL)
+    transport.send(rgb_off, PRIORITY_COSMETIC)
+    transport.send(DeviceDisplay.PAYLOAD_HEADER + b'first', PRIORITY_DISPLAY)
+    transport.send(DeviceDisplay.PAYLOAD_HEADER + b'second', PRIORITY_DISPLAY)
+    assert transport.num_queued_bytes == len(rgb_off) + len(DeviceDisplay.PAYLOAD_HEADER + b'second')
+    
+    transport.flush()
+    assert sent == [DeviceDisplay.PAYLOAD_HEADER + b'second', rgb_off], sent
+    assert transport.is_empty() and transport.num_replaced == 3
+
+
+def check_surface_snapshot() -> None:
+    """ Leaving a page keeps a snapshot of it. Coming back restores it and only the LEDs that differ are resent. """
+    controls, scheduler = new_controls()
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 0)
+    controls.refresh_surface()
+    tick(scheduler, 5)
+    
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 1)
+    assert controls.display.line2 == 'Page 2'
+    tick(scheduler, 5)
+    
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 0)
+    assert controls.display.line2 == 'Page 1'
+    assert list(controls.lights.dirty) == [DeviceLights.ID_BANK_PREVIOUS], list(controls.lights.dirty)
+    
+    # Snapshots of the mixer overview depend on the mixer display flags
+    controls.on_refresh(midi.HW_Dirty_Mixer_Display)
+    assert controls.surface_cache.get(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 1) is None
+
+
+def check_coalesced_params() -> None:
+    """ Moves of a control within a tick are merged into one absolute update plus the summed increments. """
+    controls, scheduler = new_controls()
+    event_id: int = mixer.getTrackPluginId(0, 0) + 5
+    general.rec_events.clear()
+    controls.queue_mixer_param(5, 1, incremental=True)
+    controls.queue_mixer_param(5, 64)
+    controls.queue_mixer_param(5, 2, incremental=True)
+    controls.queue_mixer_param(5, 3, incremental=True)
+    tick(scheduler)
+    absolute: int = DeviceInputControls.to_rec_value(64, limit=int(12800 * config.MAX_MIXER_VOLUME / 100.0))
+    general.rec_values[event_id] = absolute
+    expected: list[int] = [absolute, channels.incEventValue(event_id, 5, 0.01)]
+    assert [value for _, value, _ in general.rec_events] == expected, general.rec_events
+    general.rec_values.clear()
+
+
+def check_pickup_latch() -> None:
+    """ A slider only controls its track once it crosses the track's volume in FL. """
+    controls, scheduler = new_controls()
+    mixer.track_volumes[1] = 0.4
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 0)
+    controls.refresh_surface()
+    fl_value: int = MixerPickup.volume_to_slider(0.4)
+    
+    general.rec_events.clear()
+    for value in range(10, fl_value - 5):
+        controls.set_mixer_slider(0, value)
+    tick(scheduler)
+    assert not general.rec_events, 'slider moved the track before pickup'
+    
+    controls.set_mixer_slider(0, fl_value + 3)
+    tick(scheduler)
+    assert [event_id for event_id, _, _ in general.rec_events] == [mixer.getTrackPluginId(1, 0) + midi.REC_Mixer_Vol]
+    mixer.track_volumes.clear()
+
+
+def check_pickup_sweep_with_echo() -> None:
+    """ A fast sweep keeps control of its track although FL reports the script's own volume changes a tick late. """
+    controls, scheduler = new_controls()
+    refresh = RefreshCoordinator(scheduler)
+    refresh.subscribe(midi.HW_Dirty_Mixer_Controls, lambda flags: controls.refresh_mixer_values())
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, 0)
+    controls.refresh_surface()
+    track: int = controls.get_slider_track(0)
+    
+    # Like FL, apply volume changes and report them back through OnRefresh, which is dispatched on the next tick.
+    process_rec_event = general.processRECEvent
+    def process_rec_event_with_echo(event_id, value, flags):
+        if event_id == mixer.getTrackPluginId(track, 0) + midi.REC_Mixer_Vol:
+            mixer.track_volumes[track] = value / 16000.0
+            refresh.on_refresh(midi.HW_Dirty_Mixer_Controls)
+        return process_rec_event(event_id, value, flags)
+    general.processRECEvent = process_rec_event_with_echo
+    
+    try:
+        for value in range(127, 42, -2):
+            controls.set_mixer_slider(0, value)
+            controls.set_mixer_slider(0, value - 1)
+            tick(scheduler)
+        tick(scheduler, 2)
+        fl_value: int = MixerPickup.volume_to_slider(mixer.getTrackVolume(track))
+        assert abs(fl_value - 42) <= MixerPickup.TOLERANCE, 'track stopped following the slider at %d' % fl_value
+        
+        # Moving the volume in FL still takes control away from the slider
+        mixer.track_volumes[track] = 0.2
+        refresh.on_refresh(midi.HW_Dirty_Mixer_Controls)
+        tick(scheduler)
+        general.rec_events.clear()
+        controls.set_mixer_slider(0, 40)
+        tick(scheduler)
+        assert not general.rec_events, 'slider kept control after the volume changed in FL'
+    finally:
+        general.processRECEvent = process_rec_event
+        mixer.track_volumes.clear()
+
+
+def check_last_mixer_page() -> None:
+    """ Sliders past the last mixer track on the last page control nothing. """
+    controls, scheduler = new_controls()
+    controls.switch_mode(DeviceInputControls.INPUT_MODE_MIXER_OVERVIEW, DeviceInputControls.MAX_NUM_PAGES - 1)
+    tracks: list[int] = [controls.get_slider_track(slider) for slider in range(MixerPickup.NUM_SLIDERS)]
+    assigned: list[int] = [track for track in tracks if track >= 0]
+    assert len(set(assigned)) == len(assigned) < len(tracks) and max(assigned) == MixerPickup.NUM_TRACKS - 1, tracks
+    controls.refresh_mixer_values()
+    
+    general.rec_events.clear()
+    for slider in range(MixerPickup.NUM_SLIDERS - 1):
+        if tracks[slider] < 0:
+            controls.set_mixer_slider(slider, 0)
+            controls.set_mixer_slider(slider, 127)
+    tick(scheduler)
+    assert not general.rec_events, general.rec_events
+
+
+def check_name_rendering() -> None:
+    """ Nav wheel names are rendered from the name cache until OnRefresh reports a rename, and abbreviated to fit. """
+    controls, scheduler = new_controls()
+    names: NameCache = controls.names
+    patterns.pattern_names[3] = 'Drum Break Intro Verse'
+    
+    controls.display_pattern(3)
+    tick(scheduler)
+    assert controls.display.ephemeral_line1 == 'Pattern'
+    assert controls.display.ephemeral_line2 == DeviceDisplay.abbreviate('Drum Break Intro Verse')
+    assert bytes(controls.display.last_display_payload[DeviceDisplay.LINE2_START:][:DeviceDisplay.LINE_WIDTH]) \
+        == names.get_pattern(3).encoded[:DeviceDisplay.LINE_WIDTH]
+    assert names.get_pattern(3) is names.get_pattern(3)
+    
+    patterns.pattern_names[3] = 'Outro'
+    controls.display_pattern(3)
+    assert controls.display.ephemeral_line2 != 'Outro', 'rename seen before OnRefresh'
+    names.on_refresh(midi.HW_Dirty_Patterns)
+    controls.display_pattern(3)
+    assert controls.display.ephemeral_line2 == 'Outro'
+    
+    controls.display_channel(2)
+    assert controls.display.ephemeral_line1 == 'Channel'
+    patterns.pattern_names.clear()
+    
+    # Vowels are dropped whatever the case, before upper casing
+    for name in ('Filter 1 cutoff frequency', 'FILTER 1 CUTOFF FREQUENCY'):
+        assert DeviceDisplay.abbreviate(name).upper() == 'FLTR1CTFFFRQNCY', DeviceDisplay.abbreviate(name)
+    all_caps: bool = config.HINT_DISPLAY_ALL_CAPS
+    config.HINT_DISPLAY_ALL_CAPS = True
+    try:
+        assert NameCache.prepare('Filter 1 cutoff frequency').text == 'FLTR1CTFFFRQNCY'
+    finally:
+        config.HINT_DISPLAY_ALL_CAPS = all_caps
+
+
+def check_display_after_ephemeral() -> None:
+    """ A scrolling line shows from its first character again once ephemeral text expires. """
+    scheduler = Scheduler()
+    display = DeviceDisplay(lambda data, priority=0: None, scheduler)
+    display.set_lines('A long first line that is too wide', 'Short')
+    tick(scheduler, 40)
+    display.set_ephemeral_lines('Hint', 'Value', 500)
+    while display.is_ephemeral_active():
+        tick(scheduler)
+    assert display.line1_display_offset == 0
+    assert bytes(display.last_display_payload[DeviceDisplay.LINE1_START:][:DeviceDisplay.LINE_WIDTH]) \
+        == b'A long first lin'
+
+
+def check_metronome_recording() -> None:
+    """ The play light stops flashing when recording starts during playback, and is off once playback stops. """
+    scheduler = Scheduler()
+    lights = DeviceLights(lambda data, priority=0: None, scheduler)
+    metronome = MetronomeLights(lights)
+    metronome.on_beat(MetronomeLights.BEAT_BAR)
+    assert lights.desired[DeviceLights.ID_TRANSPORTS_PLAY][0] == DeviceLights.AsOnOffByte(True)
+    
+    transport.recording = True
+    metronome.on_beat(MetronomeLights.BEAT_BEAT)
+    assert lights.desired[DeviceLights.ID_TRANSPORTS_PLAY][0] == DeviceLights.AsOnOffByte(False)
+    assert lights.desired[DeviceLights.ID_TRANSPORTS_RECORD][0] == DeviceLights.AsOnOffByte(True)
+    
+    transport.stop()
+    metronome.stop()
+    for led_id in (DeviceLights.ID_TRANSPORTS_PLAY, DeviceLights.ID_TRANSPORTS_RECORD):
+        assert lights.desired[led_id][0] == DeviceLights.AsOnOffByte(False), (led_id, lights.desired[led_id])
+
+
+def check_mapping_store() -> None:
+    """ Knob mappings survive a reload: latest line wins, pins override computed mappings, old files are compacted. """
+    with tempfile.TemporaryDirectory() as path:
+        path = os.path.join(path, config.KNOB_MAPPINGS_FILE)
+        
+        def reload() -> KnobMappingStore:
+            store = KnobMappingStore(path)
+            store.load()
+            return store
+        
+        def read_lines() -> list[str]:
+            with open(path, encoding='utf-8') as f:
+                return f.readlines()
+        
+        store = KnobMappingStore(path)
+        assert store.get(('FLEX', 512)) is None
+        store.record(('FLEX', 512), [1, 2, 3])
+        store.record(('FLEX', 512), [1, 2, 3])
+        store.record(('FLEX', 512), [4, 5, 6])
+        store.record(('FLEX', 64), [7])
+        assert len(read_lines()) == 4, read_lines()
+        assert reload().get(('FLEX', 512)) == [4, 5, 6]
+        
+        # Pins win over computed mappings, a pin for one parameter count over a pin for all of them
+        store.pin('FLEX', [9])
+        store.pin('FLEX', [8], 64)
+        store.record(('FLEX', 512), [10])
+        store = reload()
+        assert store.get(('FLEX', 512)) == [9] and store.get(('FLEX', 64)) == [8] and store.get(('Sytrus', 1)) is None
+        store.pin('FLEX', None)
+        store = reload()
+        assert store.get(('FLEX', 512)) == [10] and store.get(('FLEX', 64)) == [8]
+        
+        # Malformed lines are skipped
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"plugin": "FLEX", "params"\n{"plugin": "FLEX", "params": 512, "knobs": "all"}\n\n')
+        assert reload().get(('FLEX', 512)) == [10]
+        
+        # Superseded lines are dropped once they outnumber the live mappings by COMPACT_THRESHOLD
+        for i in range(KnobMappingStore.COMPACT_THRESHOLD + 1):
+            store.record(('FLEX', 512), [i])
+        store = reload()
+        assert len(read_lines()) == 1 + len(store.mappings) + len(store.pinned), len(read_lines())
+        assert reload().get(('FLEX', 512)) == [KnobMappingStore.COMPACT_THRESHOLD]
+        assert reload().get(('FLEX', 64)) == [8]
+        
+        # Files of another version are left alone, mappings are then only kept for the session
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"version": %d}\n' % (KnobMappingStore.VERSION + 1))
+        store = reload()
+        assert store.disabled
+        store.record(('FLEX', 512), [1])
+        assert store.get(('FLEX', 512)) == [1] and len(read_lines()) == 1
+
+
+def check_device_colors() -> None:
+    """ Batch color conversion matches single conversions, with a cold and a warm cache. """
+    rgbs: list[int] = [0x5F7581, 0x8B6F47, 0x000000, 0xFFFFFF, 0x5F7581]
+    for variant in (DeviceLights.COLOR_7BIT, DeviceLights.COLOR_FADED, DeviceLights.COLOR_FULL):
+        DeviceLights._color_cache.clear()
+        cold: list[int] = DeviceLights.to_device_colors(rgbs, variant)
+        warm: list[int] = DeviceLights.to_device_colors(rgbs, variant)
+        assert cold == warm == [DeviceLights.to_device_color(rgb, variant) for rgb in rgbs]
+
+
+CHECKS = [
+    check_dispatch, check_transport_targets, check_surface_snapshot, check_coalesced_params, check_pickup_latch,
+    check_pickup_sweep_with_echo, check_last_mixer_page, check_name_rendering, check_display_after_ephemeral,
+    check_metronome_recording, check_mapping_store, check_device_colors
+]
+
+
+if __name__ == '__main__':
+    for check in CHECKS:
+        check()
+        print('%-40s ok' % check.__name__)
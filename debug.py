@@ -1,13 +1,71 @@
+from collections import deque
+
 # Enable to log messages out to console.
 DEBUG = True
 
-def log(tag, message, event=None):
-    """Log out messages to the script console if global DEBUG variable is True."""
-    if DEBUG:
-        event_str = _event_as_string(event) if event is not None else '_' * 63
-        print('%63s | [%s] %s' % (event_str, tag, message))
+# Log levels
+LEVEL_DEBUG = 10
+LEVEL_INFO = 20
+LEVEL_WARNING = 30
+LEVEL_ERROR = 40
+
+# Messages below this level are discarded, unless the tag has its own level in TAG_LEVELS.
+DEFAULT_LEVEL = LEVEL_INFO
+
+# Per tag minimum level, i.e. {'DISPATCHER': LEVEL_DEBUG} to trace every dispatched midi event.
+TAG_LEVELS = {}
+
+# Messages at or above this level are also printed to the script console. Everything else that passes the level check
+# only goes to the in-memory ring buffer (see dump).
+CONSOLE_LEVEL = LEVEL_INFO
+
+# Number of records kept in the ring buffer.
+RING_BUFFER_SIZE = 256
+
+# Raw, unformatted log records: (level, tag, message, args, event fields)
+_records = deque(maxlen=RING_BUFFER_SIZE)
+
+
+def set_level(tag, level):
+    """Set the minimum level for messages of the given tag."""
+    TAG_LEVELS[tag] = level
+
+def is_enabled(tag, level=LEVEL_DEBUG):
+    """Returns True if a message with the given tag and level would be recorded."""
+    return DEBUG and level >= TAG_LEVELS.get(tag, DEFAULT_LEVEL)
+
+def log(tag, message, *args, event=None, level=LEVEL_DEBUG):
+    """Log out messages to the script console if global DEBUG variable is True.
+
+    Formatting is deferred: message is only %-formatted with args when the record is printed or dumped.
+    """
+    if not DEBUG or level < TAG_LEVELS.get(tag, DEFAULT_LEVEL): return
+
+    # FL reuses event objects, so copy the fields out now and format them later.
+    fields = _event_fields(event) if event is not None else None
+    _records.append((level, tag, message, args, fields))
+    if level >= CONSOLE_LEVEL:
+        print(_format_record(tag, message, args, fields))
+
+def dump(clear=False):
+    """Print the records held in the ring buffer to the script console and return them as strings."""
+    lines = [_format_record(tag, message, args, fields) for _, tag, message, args, fields in _records]
+    for line in lines:
+        print(line)
+    if clear:
+        _records.clear()
+    return lines
+
+def _format_record(tag, message, args, fields):
+    if args: message = message % args
+    event_str = _EVENT_FORMAT % fields if fields is not None else '_' * 63
+    return '%63s | [%s] %s' % (event_str, tag, message)
+
+def _event_fields(event):
+    return event.midiId, event.status, event.controlNum, event.controlVal, event.data1, event.data2
+
+_EVENT_FORMAT = '[id, status, cnum, cval, d1, d2] = %3d, %3d, %3d, %3d, %3d, %3d'
 
 def _event_as_string(event):
     """Convert a midi event packet to a string representation."""
-    return '[id, status, cnum, cval, d1, d2] = %3d, %3d, %3d, %3d, %3d, %3d' % (
-        event.midiId, event.status, event.controlNum, event.controlVal, event.data1, event.data2)
\ No newline at end of file
+    return _EVENT_FORMAT % _event_fields(event)
@@ -1,5 +1,72 @@
 # name=Arturia KeyLab MKII (DAC)
 # supportedDevices=Arturia KeyLab MKII 61, Arturia KeyLab MKII 88
+import time
+
+# Start of the script load, to record how long the imports, construction and OnInit take. See instrument.startup_ms.
+load_start_s = time.perf_counter()
+
+from arturia import config, instrument, surface
+from arturia.dispatch import SysexTransport
+from arturia.display import DeviceDisplay
+from arturia.encoder import DeviceInputControls
+from arturia.light import DeviceLights
+from arturia.mapping_store import KnobMappingStore
+from arturia.metronome import MetronomeLights
+from arturia.names import NameCache
+from arturia.refresh import RefreshCoordinator
+from arturia.scheduler import Scheduler
+
+"""Import from FL Studio library"""
+import midi
+import transport
+
+construct_start_s = instrument.record_startup('import', load_start_s)
+
+# Drives LED flushes, display scrolling and ephemeral text expiration from OnIdle.
+scheduler = Scheduler()
+
+# Sends the LED and display updates by priority within the midi out bandwidth budget.
+sysex_transport = SysexTransport()
+lights = DeviceLights(send_fn=sysex_transport.send, scheduler=scheduler)
+display = DeviceDisplay(send_fn=sysex_transport.send, scheduler=scheduler)
+metronome = MetronomeLights(lights)
+
+# Knob mappings saved by previous sessions. The file is read on the first idle tick or plugin focus, whichever is first.
+mapping_store = KnobMappingStore(KnobMappingStore.get_default_path()) if config.ENABLE_KNOB_MAPPING_STORE else None
+controls = DeviceInputControls(display, scheduler, lights, mapping_store=mapping_store)
+
+def on_leds_dirty(flags):
+    if not transport.isPlaying(): metronome.stop()
+
+def on_mixer_dirty(flags):
+    controls.refresh_mixer_values()
+
+def on_plugin_focus_dirty(flags):
+    if controls.mode == DeviceInputControls.INPUT_MODE_CHANNEL_PLUGINS: controls.refresh_surface()
+
+# Runs only the work that depends on the dirty flags reported by OnRefresh, once per idle tick.
+refresh = RefreshCoordinator(scheduler)
+refresh.subscribe(surface.DIRTY_MASK_CHANNEL_PLUGINS | surface.DIRTY_MASK_MIXER_OVERVIEW, controls.on_refresh)
+refresh.subscribe(midi.HW_Dirty_Mixer_Display | midi.HW_Dirty_Mixer_Controls, on_mixer_dirty)
+refresh.subscribe(midi.HW_Dirty_FocusedWindow | midi.HW_ChannelEvent, on_plugin_focus_dirty)
+refresh.subscribe(midi.HW_Dirty_LEDs, on_leds_dirty)
+refresh.subscribe(NameCache.DIRTY_MASK, controls.names.on_refresh)
+
+instrument.record_startup('construct', construct_start_s)
 
 def OnInit():
-    print("Script initialized.")
\ No newline at end of file
+    init_start_s = time.perf_counter()
+    if mapping_store is not None: scheduler.call_at(0, mapping_store.load)
+    controls.refresh_surface()
+    instrument.record_startup('init', init_start_s)
+    print("Script initialized in %.1f ms." % instrument.get_startup_ms())
+
+def OnIdle():
+    scheduler.tick()
+    sysex_transport.flush()
+
+def OnRefresh(flags):
+    refresh.on_refresh(flags)
+
+def OnUpdateBeatIndicator(value):
+    metronome.on_beat(value)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Offline stand-in for FL Studio, used to run and benchmark the driver outside of FL.
+
+Call install() before importing anything from the arturia package:
+
+    import simulator
+    clock = simulator.install()
+    from arturia.light import DeviceLights
+"""
+import os
+import sys
+import time
+
+FL_MODULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fl')
+
+
+class VirtualClock:
+    """ Replaces time.monotonic so that scripted inputs can be replayed faster than real time. """
+    def __init__(self, start_s: float = 1000.0) -> None:
+        self.now_s: float = start_s
+        self.real_monotonic = time.monotonic
+    
+    def monotonic(self) -> float:
+        return self.now_s
+    
+    def advance_ms(self, delta_ms: float) -> None:
+        self.now_s += delta_ms / 1000.0
+    
+    def set_ms(self, time_ms: float) -> None:
+        self.now_s = time_ms / 1000.0
+    
+    def install(self) -> None:
+        time.monotonic = self.monotonic
+    
+    def uninstall(self) -> None:
+        time.monotonic = self.real_monotonic
+
+
+class MidiEvent:
+    """ Mirror of the event object FL passes to OnMidiMsg. """
+    def __init__(self, status: int, data1: int, data2: int, midi_id: int = 0) -> None:
+        self.midiId: int = midi_id or status & 0xF0
+        self.status: int = status
+        self.data1: int = data1
+        self.data2: int = data2
+        self.midiChan: int = status & 0x0F
+        self.controlNum: int = data1
+        self.controlVal: int = data2
+        self.note: int = data1
+        self.velocity: int = data2
+        self.port: int = 0
+        self.sysex: bytes = b''
+        self.handled: bool = False
+
+
+def install(device_name: str | None = None, virtual_time: bool = True) -> VirtualClock | None:
+    """ Make the stand-in FL modules importable.
+
+    :param device_name: name reported by device.getName, i.e. 'Arturia KeyLab mkII 88'.
+    :param virtual_time: replace time.monotonic with a VirtualClock that only advances when told to.
+    :return: the installed VirtualClock, or None when running in real time.
+    """
+    if FL_MODULES_PATH not in sys.path:
+        sys.path.insert(0, FL_MODULES_PATH)
+    repo_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_path not in sys.path:
+        sys.path.insert(1, repo_path)
+    
+    import device
+    if device_name is not None:
+        device.name = device_name
+    
+    if not virtual_time: return None
+    clock = VirtualClock()
+    clock.install()
+    return clock
+
+
+def replay(stream, on_event, on_idle=None, clock: VirtualClock | None = None, idle_interval_ms: float = 20.0):
+    """ Feed a scripted input stream to the driver.
+
+    :param stream: iterable of (timestamp ms, MidiEvent) sorted by timestamp. Timestamps are relative to the start.
+    :param on_event: called with each event, i.e. the script's OnMidiMsg.
+    :param on_idle: called every idle_interval_ms of stream time, i.e. the script's OnIdle.
+    :param clock: virtual clock to advance along with the stream. Without it, the stream is replayed in real time.
+    :return: list of the per-event on_event durations in microseconds.
+    """
+    perf_counter = time.perf_counter
+    durations_us: list[float] = []
+    base_ms: float = clock.now_s * 1000.0 if clock is not None else perf_counter() * 1000.0
+    
+    def advance_to(offset_ms: float) -> None:
+        if clock is not None:
+            clock.set_ms(base_ms + offset_ms)
+            return
+        delay_ms: float = base_ms + offset_ms - perf_counter() * 1000.0
+        if delay_ms > 0: time.sleep(delay_ms / 1000.0)
+    
+    next_idle_ms: float = 0.0
+    last_ms: float = 0.0
+    for timestamp_ms, event in stream:
+        if on_idle is not None:
+            while next_idle_ms <= timestamp_ms:
+                advance_to(next_idle_ms)
+                on_idle()
+                next_idle_ms += idle_interval_ms
+        advance_to(timestamp_ms)
+        last_ms = timestamp_ms
+        
+        begin_s: float = perf_counter()
+        on_event(event)
+        durations_us.append((perf_counter() - begin_s) * 1e6)
+    
+    # Keep ticking for a second so that whatever is still pending gets flushed
+    if on_idle is not None:
+        while next_idle_ms <= last_ms + 1000.0:
+            advance_to(next_idle_ms)
+            on_idle()
+            next_idle_ms += idle_interval_ms
+    
+    return durations_us
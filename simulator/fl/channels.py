@@ -0,0 +1,23 @@
+"""Stand-in for FL Studio's channels module."""
+channel_names = ['Kick', 'Clap', 'Hat', 'Snare', 'Bass', 'Lead', 'Pad', 'Pluck']
+channel_colors = [0x5F7581, 0x8B6F47, 0x4F8A8B, 0xA05A7A, 0x556B2F, 0x7B68EE, 0xB8860B, 0x2E8B57]
+selected_channel = 0
+
+def channelCount(*args):
+    return len(channel_names)
+
+def channelNumber(*args):
+    return selected_channel
+
+def selectedChannel(*args):
+    return selected_channel
+
+def getChannelName(index, *args):
+    return channel_names[index]
+
+def getChannelColor(index, *args):
+    return channel_colors[index]
+
+def incEventValue(event_id, step, res=0.01):
+    import general
+    return general.rec_values.get(event_id, 0) + int(step * res * (1 << 30))
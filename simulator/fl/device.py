@@ -0,0 +1,17 @@
+"""Stand-in for FL Studio's device module. Records every sysex message sent to the keyboard."""
+import time
+
+# Name reported by getName. Set before importing the arturia package to simulate other keyboard models.
+name = 'Arturia KeyLab mkII 61'
+
+# Sent sysex messages: (monotonic timestamp in seconds, message bytes)
+sysex_log = []
+
+def getName():
+    return name
+
+def midiOutSysex(message):
+    sysex_log.append((time.monotonic(), bytes(message)))
+
+def isAssigned():
+    return True
@@ -0,0 +1,21 @@
+"""Stand-in for FL Studio's general module."""
+version = 30
+
+# Recorded calls to processRECEvent: (event id, value, flags)
+rec_events = []
+
+# Current value of every REC event id.
+rec_values = {}
+
+ppq = 96
+
+def getVersion():
+    return version
+
+def getRecPPQ():
+    return ppq
+
+def processRECEvent(event_id, value, flags):
+    rec_events.append((event_id, value, flags))
+    rec_values[event_id] = value
+    return value
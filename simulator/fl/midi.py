@@ -0,0 +1,35 @@
+"""Stand-in for FL Studio's midi module. Only the constants used by the driver are defined."""
+FromMIDI_Max = 1 << 30
+
+REC_UpdateValue     = 1 << 0
+REC_GetValue        = 1 << 1
+REC_ShowHint        = 1 << 2
+REC_UpdatePlugLabel = 1 << 3
+REC_UpdateControl   = 1 << 4
+REC_SetChanged      = 1 << 5
+
+HW_Dirty_Mixer_Sel          = 1
+HW_Dirty_Mixer_Display      = 2
+HW_Dirty_Mixer_Controls     = 4
+HW_Dirty_RemoteLinks        = 16
+HW_Dirty_FocusedWindow      = 32
+HW_Dirty_Performance        = 64
+HW_Dirty_LEDs               = 256
+HW_Dirty_RemoteLinkValues   = 512
+HW_Dirty_Patterns           = 1024
+HW_Dirty_Tracks             = 2048
+HW_Dirty_ControlValues      = 4096
+HW_Dirty_Colors             = 8192
+HW_Dirty_Names              = 16384
+HW_Dirty_ChannelRackGroup   = 32768
+HW_ChannelEvent             = 65536
+
+SONGLENGTH_MS       = 0
+SONGLENGTH_S        = 1
+SONGLENGTH_ABSTICKS = 2
+SONGLENGTH_BARS     = 3
+SONGLENGTH_STEPS    = 4
+SONGLENGTH_TICKS    = 5
+
+REC_Mixer_Vol = 0
+REC_Mixer_Pan = 1
@@ -0,0 +1,20 @@
+"""Stand-in for FL Studio's mixer module."""
+track_count = 127
+selected_track = 0
+track_names = {}
+track_volumes = {}
+
+def trackCount():
+    return track_count
+
+def trackNumber():
+    return selected_track
+
+def getTrackName(index):
+    return track_names.get(index, 'Insert %d' % index)
+
+def getTrackVolume(index):
+    return track_volumes.get(index, 0.8)
+
+def getTrackPluginId(index, plugin_index):
+    return (index << 6 | plugin_index) << 16
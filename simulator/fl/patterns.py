@@ -0,0 +1,13 @@
+"""Stand-in for FL Studio's patterns module."""
+pattern_names = {}
+pattern_count = 16
+selected_pattern = 1
+
+def patternCount():
+    return pattern_count
+
+def patternNumber():
+    return selected_pattern
+
+def getPatternName(index):
+    return pattern_names.get(index, 'Pattern %d' % index)
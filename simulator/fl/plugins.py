@@ -0,0 +1,23 @@
+"""Stand-in for FL Studio's plugins module. Plugins are registered per channel with set_plugin."""
+# channel index -> (plugin name, list of parameter names)
+loaded_plugins = {}
+
+# Number of getParamName calls, to measure parameter discovery cost.
+param_name_calls = 0
+
+def set_plugin(index, name, param_names):
+    loaded_plugins[index] = (name, list(param_names))
+
+def isValid(index, *args):
+    return index in loaded_plugins
+
+def getPluginName(index, *args):
+    return loaded_plugins[index][0]
+
+def getParamCount(index, *args):
+    return len(loaded_plugins[index][1])
+
+def getParamName(param_index, index, *args):
+    global param_name_calls
+    param_name_calls += 1
+    return loaded_plugins[index][1][param_index]
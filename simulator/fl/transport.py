@@ -0,0 +1,32 @@
+"""Stand-in for FL Studio's transport module. The song position advances with the monotonic clock while playing."""
+import time
+
+import general
+
+playing = False
+recording = False
+tempo_bpm = 140.0
+start_time = 0.0
+
+def start():
+    global playing, start_time
+    playing = True
+    start_time = time.monotonic()
+
+def stop():
+    global playing, recording
+    playing = False
+    recording = False
+
+def isPlaying():
+    return playing
+
+def isRecording():
+    return recording
+
+def getSongPos(mode=-1):
+    if not playing: return 0
+    beats = (time.monotonic() - start_time) * tempo_bpm / 60.0
+    if mode == 2:
+        return int(beats * general.getRecPPQ())
+    return beats
@@ -0,0 +1,14 @@
+"""Stand-in for FL Studio's ui module."""
+hint_message = ''
+
+def getHintMsg():
+    return hint_message
+
+def setHintMsg(message):
+    global hint_message
+    hint_message = message
+
+metronome_enabled = True
+
+def isMetronomeEnabled():
+    return metronome_enabled
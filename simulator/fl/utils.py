@@ -0,0 +1,12 @@
+"""Stand-in for FL Studio's utils module."""
+import colorsys
+
+def RGBToHSVColor(color):
+    r = ((color >> 16) & 0xFF) / 255.0
+    g = ((color >> 8) & 0xFF) / 255.0
+    b = (color & 0xFF) / 255.0
+    h, s, v = colorsys.rgb_to_hsv(r, g, b)
+    return h * 360.0, s, v
+
+def HSVtoRGB(h, s, v):
+    return colorsys.hsv_to_rgb(h / 360.0, s, v)
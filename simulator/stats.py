@@ -0,0 +1,20 @@
+"""Helpers to summarize benchmark measurements."""
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values: return 0.0
+    ordered: list[float] = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(values: list[float]) -> str:
+    """ Format p50 / p99 / max of a list of durations in microseconds. """
+    return 'p50 %8.2f us | p99 %8.2f us | max %8.2f us | n %d' % (
+        percentile(values, 0.5), percentile(values, 0.99), max(values) if values else 0.0, len(values))
+
+
+def sysex_rate(sysex_log: list, duration_ms: float) -> tuple[float, float]:
+    """ Messages and bytes per second recorded in device.sysex_log over duration_ms. """
+    if duration_ms <= 0: return 0.0, 0.0
+    num_bytes: int = sum(len(message) for _, message in sysex_log)
+    return len(sysex_log) * 1000.0 / duration_ms, num_bytes * 1000.0 / duration_ms
@@ -0,0 +1,51 @@
+"""Scripted midi input streams for replay. Each stream yields (timestamp ms, MidiEvent) tuples."""
+from simulator import MidiEvent
+
+# Midi messages of the KeyLab mkII in DAW mode.
+STATUS_CONTROL      = 0xB0
+STATUS_PITCH_BEND   = 0xE0
+KNOB_CONTROL_IDS    = [0x10, 0x11, 0x12, 0x13, 0x14, 0x15, 0x16, 0x17, 0x18]
+
+
+def slider_sweep(duration_ms: float, rate_hz: float = 1000.0, num_sliders: int = 9):
+    """ All sliders swept up and down continuously, interleaved, at rate_hz messages per second in total. """
+    # Sliders send pitch bend on their own midi channel, 14-bit value
+    interval_ms: float = 1000.0 / rate_hz
+    step: int = 0
+    while step * interval_ms < duration_ms:
+        slider: int = step % num_sliders
+        position: int = (step // num_sliders) % 256
+        value: int = position if position < 128 else 255 - position
+        yield step * interval_ms, MidiEvent(STATUS_PITCH_BEND | slider, 0, value)
+        step += 1
+
+
+def knob_turns(duration_ms: float, rate_hz: float = 500.0, num_knobs: int = 9):
+    """ Relative knob turns, alternating one detent clockwise on every knob. """
+    interval_ms: float = 1000.0 / rate_hz
+    step: int = 0
+    while step * interval_ms < duration_ms:
+        yield step * interval_ms, MidiEvent(STATUS_CONTROL, KNOB_CONTROL_IDS[step % num_knobs], 0x41)
+        step += 1
+
+
+def large_plugin_params(num_params: int = 3000):
+    """ Parameter names resembling a large synth such as Serum or Vital. """
+    names: list[str] = ['Filter 1 Cutoff', 'Filter 1 Resonance', 'LFO 1 Rate', 'LFO 1 Delay', 'Macro 1', 'Macro 2',
+                        'Macro 3', 'Macro 4', 'Chorus Mix']
+    sections: list[str] = ['Osc A', 'Osc B', 'Env', 'FX', 'Mod']
+    i: int = 0
+    while len(names) < num_params:
+        names.insert(len(names) // 2, '%s Param %d' % (sections[i % len(sections)], i))
+        i += 1
+    return names
+
+
+def beat_indicator(bpm: float, duration_ms: float, beats_per_bar: int = 4):
+    """ Values FL passes to OnUpdateBeatIndicator while playing: 1 on bars, 2 on beats, 0 half a beat later. """
+    beat_ms: float = 60000.0 / bpm
+    beat: int = 0
+    while beat * beat_ms < duration_ms:
+        yield beat * beat_ms, 1 if beat % beats_per_bar == 0 else 2
+        yield (beat + 0.5) * beat_ms, 0
+        beat += 1